@@ -3,7 +3,7 @@
     'name': 'Uzbekistan - Accounting',
     'author': 'Colibri',
     'website': 'https://clbr.uz',
-    'version': '14.0.1',
+    'version': '14.0.1.1',
     'description': """
 Uzbekistan - Chart of accounts.
 ============================
@@ -14,7 +14,7 @@ Uzbekistan - Chart of accounts.
         'data/account_chart_template.xml',
         'data/res.bank.csv',
         'data/res.partner.industry.csv',
-        'data/account.group.csv',
+        'data/account.group.template.csv',
         'data/account.account.template.csv',
         'data/account_tax_group_data.xml',
         'data/account_tax_data.xml',
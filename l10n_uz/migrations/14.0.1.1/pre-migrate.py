@@ -0,0 +1,16 @@
+# coding: utf-8
+
+
+def migrate(cr, version):
+    # account groups are now generated for every company from account.group.template: give the
+    # groups loaded by the former data file the external id the chart template generates, with
+    # noupdate like the generated ones, so they are kept instead of being removed as obsolete data
+    cr.execute("""
+        UPDATE ir_model_data d
+           SET name = g.company_id || '_' || d.name,
+               noupdate = true
+          FROM account_group g
+         WHERE d.module = 'l10n_uz'
+           AND d.model = 'account.group'
+           AND d.res_id = g.id
+    """)
@@ -0,0 +1,79 @@
+# coding: utf-8
+import importlib.util
+
+from odoo.modules.module import get_resource_path
+from odoo.tests import SavepointCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestL10nUzChartTemplate(SavepointCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.chart_template = cls.env.ref('l10n_uz.l10n_uz_nsbu_chart_template')
+
+    @classmethod
+    def _create_companies(cls, count):
+        return cls.env['res.company'].create([{
+            'name': 'UZ Company %s' % index,
+            'country_id': cls.env.ref('base.uz').id,
+            'currency_id': cls.env.ref('base.UZS').id,
+        } for index in range(count)])
+
+    def test_load_on_companies(self):
+        # the groups are templates: every company the chart is loaded on gets them
+        companies = self._create_companies(2)
+        for company in companies:
+            self.chart_template.try_loading(company=company)
+
+        group_count = self.env['account.group.template'].search_count([('chart_template_id', '=', self.chart_template.id)])
+        for company in companies:
+            self.assertEqual(company.chart_template_id, self.chart_template)
+            groups = self.env['account.group'].search([('company_id', '=', company.id)])
+            self.assertEqual(len(groups), group_count)
+            group_data = self.env['ir.model.data'].search([('model', '=', 'account.group'), ('res_id', 'in', groups.ids)])
+            self.assertEqual(set(group_data.mapped('noupdate')), {True})
+            journals = self.env['account.journal'].search([('company_id', '=', company.id)])
+            self.assertEqual(set(journals.filtered(lambda j: j.type in ('bank', 'cash')).mapped('name')),
+                             {'Касса организации', 'Расчетные счета'})
+            self.assertTrue(journals.filtered(lambda j: j.type == 'sale'))
+            account = self.env['account.account'].search([('company_id', '=', company.id), ('code', '=', '011000')])
+            self.assertTrue(account.group_id)
+
+
+@tagged('post_install', '-at_install')
+class TestL10nUzMigration(SavepointCase):
+
+    def _migrate(self, version):
+        path = get_resource_path('l10n_uz', 'migrations', version, 'pre-migrate.py')
+        spec = importlib.util.spec_from_file_location('l10n_uz_pre_migrate_%s' % version.replace('.', '_'), path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.migrate(self.env.cr, version)
+
+    def test_migrate_account_groups(self):
+        # an account group as loaded by the former data file
+        company = self.env.company
+        group = self.env['account.group'].create({
+            'name': 'Legacy group',
+            'code_prefix_start': '990000',
+            'code_prefix_end': '999999',
+            'company_id': company.id,
+        })
+        self.env['ir.model.data'].create({
+            'module': 'l10n_uz',
+            'name': 'account_group_legacy',
+            'model': 'account.group',
+            'res_id': group.id,
+            'noupdate': False,
+        })
+        self.env['base'].flush()
+
+        self._migrate('14.0.1.1')
+
+        self.env['ir.model.data'].invalidate_cache()
+        data = self.env['ir.model.data'].search([('model', '=', 'account.group'), ('res_id', '=', group.id)])
+        self.assertEqual(data.complete_name, 'l10n_uz.%s_account_group_legacy' % company.id)
+        # noupdate records are never removed as obsolete data at the end of the upgrade
+        self.assertTrue(data.noupdate)
@@ -15,10 +15,16 @@
     ],
     'data': [
         'data/sale_contract_data.xml',
+        'data/res_currency_words_data.xml',
         'views/account_move_views.xml',
         'views/sale_order_views.xml',
         'views/sale_contract_views.xml',
         'views/res_partner_views.xml',
+        'views/res_currency_words_views.xml',
+        'views/sale_contract_invoice_run_views.xml',
+        'wizard/sale_contract_reprice_views.xml',
+        'wizard/sale_contract_invoice_preview_views.xml',
+        'report/sale_contract_report_views.xml',
         'security/ir.model.access.csv'
     ],
     'qweb': [
@@ -3,4 +3,5 @@ from . import sale_contract
 from . import sale_order
 from . import res_partner
 from . import account_move
-
+from . import amount_words
+from . import sale_contract_invoice_run
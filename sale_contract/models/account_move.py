@@ -9,4 +9,50 @@ _logger = logging.getLogger(__name__)
 
 class AccountMove(models.Model):
     _inherit = "account.move"
-    contract_id = fields.Many2one('sale.contract', 'Contract', copy=False, check_company=True)
+    contract_id = fields.Many2one('sale.contract', 'Contract', copy=False, check_company=True, index=True)
+
+    def _amount_to_words(self, amount):
+        """Spell ``amount``, in the currency of the move and the language of its partner."""
+        self.ensure_one()
+        return self.env['amount.words'].amount_to_words(amount, self.currency_id, self.partner_id.lang)
+
+    def _post(self, soft=True):
+        posted = super(AccountMove, self)._post(soft=soft)
+        posted.contract_id._refresh_receivable_balance()
+        return posted
+
+    def button_draft(self):
+        res = super(AccountMove, self).button_draft()
+        self.contract_id._refresh_receivable_balance()
+        return res
+
+    def button_cancel(self):
+        res = super(AccountMove, self).button_cancel()
+        self.contract_id._refresh_receivable_balance()
+        return res
+
+    def _reverse_move_vals(self, default_values, cancel=True):
+        # credit notes count in the balance of the contract of the invoice they reverse
+        move_vals = super(AccountMove, self)._reverse_move_vals(default_values, cancel=cancel)
+        if self.contract_id and 'contract_id' not in default_values:
+            move_vals['contract_id'] = self.contract_id.id
+        return move_vals
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = "account.partial.reconcile"
+
+    def _get_contracts(self):
+        return (self.debit_move_id.move_id | self.credit_move_id.move_id).contract_id
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super(AccountPartialReconcile, self).create(vals_list)
+        partials._get_contracts()._refresh_receivable_balance()
+        return partials
+
+    def unlink(self):
+        contracts = self._get_contracts()
+        res = super(AccountPartialReconcile, self).unlink()
+        contracts._refresh_receivable_balance()
+        return res
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+import logging
+
+from odoo import api, fields, models, tools
+from odoo.tools import float_round
+
+_logger = logging.getLogger(__name__)
+
+
+class ResCurrencyWords(models.Model):
+    _name = "res.currency.words"
+    _description = "Currency Forms in Words"
+    _order = "currency_id, lang"
+
+    currency_id = fields.Many2one('res.currency', string='Currency', required=True, ondelete='cascade')
+    lang = fields.Char(string='Language', required=True, help="Language code of num2words, e.g. ru or en.")
+    unit_one = fields.Char(string='Unit (1)', required=True, help="Form of the unit after 1, e.g. доллар")
+    unit_few = fields.Char(string='Unit (2)', required=True, help="Form of the unit after 2, e.g. доллара")
+    unit_many = fields.Char(string='Unit (5)', required=True, help="Form of the unit after 5, e.g. долларов")
+    subunit_one = fields.Char(string='Subunit (1)', required=True)
+    subunit_few = fields.Char(string='Subunit (2)', required=True)
+    subunit_many = fields.Char(string='Subunit (5)', required=True)
+
+    _sql_constraints = [
+        ('currency_lang_uniq', 'unique (currency_id, lang)', 'The forms of a currency are defined once per language.'),
+    ]
+
+    @api.model
+    def _get_currency_forms(self, lang):
+        """Return the forms registered for ``lang``, as num2words ``CURRENCY_FORMS``."""
+        return {
+            words.currency_id.name: (
+                (words.unit_one, words.unit_few, words.unit_many),
+                (words.subunit_one, words.subunit_few, words.subunit_many),
+            )
+            for words in self.search([('lang', '=', lang)])
+        }
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.env['amount.words'].clear_caches()
+        return super(ResCurrencyWords, self).create(vals_list)
+
+    def write(self, vals):
+        self.env['amount.words'].clear_caches()
+        return super(ResCurrencyWords, self).write(vals)
+
+    def unlink(self):
+        self.env['amount.words'].clear_caches()
+        return super(ResCurrencyWords, self).unlink()
+
+
+class AmountWords(models.AbstractModel):
+    _name = "amount.words"
+    _description = "Amount in Words"
+
+    @api.model
+    def amount_to_words(self, amount, currency, lang=None):
+        """
+        Spell an amount of money, e.g. for the sums in words of printed contracts and invoices.
+        :params amount: amount to spell
+        :params currency: res.currency record
+        :params lang: code of the language (e.g. ru_RU), the one of the context by default
+        :returns: the amount in words
+        """
+        lang = lang or self.env.context.get('lang') or 'en_US'
+        return self._amount_to_words(float_round(amount, precision_rounding=currency.rounding), currency.id, lang)
+
+    @api.model
+    @tools.ormcache('amount', 'currency_id', 'lang')
+    def _amount_to_words(self, amount, currency_id, lang):
+        currency = self.env['res.currency'].browse(currency_id)
+        converter = self._get_converter(lang)
+        if converter is None or currency.name not in converter.CURRENCY_FORMS:
+            return currency.with_context(lang=lang).amount_to_text(amount)
+        return converter.to_currency(amount, currency=currency.name)
+
+    @api.model
+    @tools.ormcache('lang')
+    def _get_converter(self, lang):
+        """
+        Return a num2words converter for ``lang`` knowing the currency forms registered for it,
+        or None when num2words does not support the language. The backend is imported on first
+        use and a private instance is patched, the classes of num2words are left untouched.
+        """
+        try:
+            from num2words import CONVERTER_CLASSES
+        except ImportError:
+            _logger.warning("The num2words python library is not installed, amounts in words will be approximate.")
+            return None
+        code = lang if lang in CONVERTER_CLASSES else lang.split('_')[0]
+        backend = CONVERTER_CLASSES.get(code)
+        if backend is None:
+            return None
+        converter = type(backend)()
+        converter.CURRENCY_FORMS = dict(
+            backend.CURRENCY_FORMS, **self.env['res.currency.words'].sudo()._get_currency_forms(code))
+        return converter
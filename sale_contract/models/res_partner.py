@@ -14,21 +14,31 @@ class ResPartner(models.Model):
     contract_ids = fields.One2many('sale.contract', 'partner_id', 'Contract')
 
     def _compute_contract_count(self):
-        # retrieve all children partners and prefetch 'parent_id' on them
-        all_partners = self.with_context(active_test=False).search([('id', 'child_of', self.ids)])
-        all_partners.read(['parent_id'])
-        _logger.warning(all_partners)
-        sale_contract_groups = self.env['sale.contract'].read_group(
-            domain=[('partner_id', 'in', all_partners.ids)],
-            fields=['partner_id'], groupby=['partner_id']
-        )
-        _logger.warning(sale_contract_groups)
-        partners = self.browse()
-        for group in sale_contract_groups:
-            partner = self.browse(group['partner_id'][0])
-            while partner:
-                if partner in self:
-                    partner.contract_count += group['partner_id_count']
-                    partners |= partner
-                partner = partner.parent_id
-        (self - partners).contract_count = 0
+        # count the contracts of every partner and of all its descendants, in a single query
+        partner_ids = tuple(self._origin.ids)
+        if not partner_ids:
+            self.contract_count = 0
+            return
+        self.flush(['parent_id'])
+        Contract = self.env['sale.contract']
+        Contract.flush(['partner_id', 'active', 'company_id'])
+        query = Contract._where_calc([])
+        Contract._apply_ir_rules(query, 'read')
+        from_clause, where_clause, where_params = query.get_sql()
+        self.env.cr.execute("""
+            WITH RECURSIVE partner_tree(root_id, partner_id) AS (
+                SELECT id, id FROM res_partner WHERE id IN %s
+                UNION
+                SELECT tree.root_id, child.id
+                FROM res_partner child
+                JOIN partner_tree tree ON child.parent_id = tree.partner_id
+            )
+            SELECT tree.root_id, count(*)
+            FROM partner_tree tree
+            JOIN (SELECT "sale_contract".partner_id FROM {} WHERE {}) contract
+                ON contract.partner_id = tree.partner_id
+            GROUP BY tree.root_id
+        """.format(from_clause, where_clause or 'TRUE'), [partner_ids] + where_params)
+        counts = dict(self.env.cr.fetchall())
+        for partner in self:
+            partner.contract_count = counts.get(partner._origin.id, 0)
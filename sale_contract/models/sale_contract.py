@@ -2,21 +2,20 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 import datetime
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
+import psycopg2
 from dateutil.relativedelta import relativedelta
 from odoo import api, fields, models, _
-from odoo.exceptions import UserError
-from odoo.tools import format_datetime, format_date, float_compare
-
-from num2words.lang_RU import Num2Word_RU
-from num2words.lang_EN import Num2Word_EN
+from odoo.exceptions import UserError, ValidationError
+from odoo.osv import expression
+from odoo.service.model import PG_CONCURRENCY_ERRORS_TO_RETRY, MAX_TRIES_ON_CONCURRENCY_FAILURE
+from odoo.tools import format_datetime, format_date, float_compare, html_escape, split_every, str2bool, ustr
 
 _logger = logging.getLogger(__name__)
 
-Num2Word_RU.CURRENCY_FORMS['USD'] = (('доллар', 'доллара', 'долларов'), ('цент', 'центы', 'центов'))
-Num2Word_RU.CURRENCY_FORMS['UZS'] = (('сум', 'сума', 'сумов'), ('тиин', 'тиины', 'тиинов'))
-Num2Word_EN.CURRENCY_FORMS['UZS'] = (('sum', 'sum', 'sum'), ('tiin', 'tiin', 'tiin'))
-
 
 class SaleContract(models.Model):
     _name = "sale.contract"
@@ -29,6 +28,7 @@ class SaleContract(models.Model):
 
     name = fields.Char(string='Number', required=True, tracking=True)
     active = fields.Boolean(default=True, tracking=True)
+    date_archived = fields.Date(string='Archived On', readonly=True, copy=False)
 
     state = fields.Selection([
         ('draft', 'Draft'),
@@ -40,7 +40,7 @@ class SaleContract(models.Model):
     date_confirmed = fields.Datetime(string='Confirmed Date', required=True, readonly=True, index=True, states={'draft': [('readonly', False)], 'done': [('readonly', False)]}, copy=False, default=fields.Datetime.now)
 
     company_id = fields.Many2one('res.company', string="Company", default=lambda s: s.env.company, required=True)
-    partner_id = fields.Many2one('res.partner', string='Partner', required=True, auto_join=True, domain="['|', ('company_id', '=', False), ('company_id', '=', company_id)]")
+    partner_id = fields.Many2one('res.partner', string='Partner', required=True, auto_join=True, index=True, domain="['|', ('company_id', '=', False), ('company_id', '=', company_id)]")
 
     date_start = fields.Date(string='Start Date', default=fields.Date.today)
     date_end = fields.Date(string='End Date', tracking=True)
@@ -68,7 +68,8 @@ class SaleContract(models.Model):
     description = fields.Text()
     user_id = fields.Many2one('res.users', string='Salesperson', tracking=True, default=lambda self: self.env.user)
 
-    invoice_count = fields.Integer(compute='_compute_invoice_count')
+    invoice_ids = fields.One2many('account.move', 'contract_id', string='Invoices')
+    invoice_count = fields.Integer(compute='_compute_invoice_count', store=True)
     country_id = fields.Many2one('res.country', related='partner_id.country_id', store=True, readonly=False, compute_sudo=True)
 
     pricelist_id = fields.Many2one('product.pricelist',
@@ -76,51 +77,211 @@ class SaleContract(models.Model):
                                    string='Pricelist', default=_get_default_pricelist, required=True,
                                    check_company=True)
     currency_id = fields.Many2one('res.currency', related='pricelist_id.currency_id', string='Currency', readonly=True)
-    contract_line_ids = fields.One2many('sale.contract.line', 'contract_id', string='Contract Lines', copy=True)
+    # lines and subcontracts follow the archiving of their contract
+    contract_line_ids = fields.One2many('sale.contract.line', 'contract_id', string='Contract Lines', copy=True,
+                                        context={'active_test': False})
 
     sale_order_ids = fields.One2many('sale.order', 'contract_id', string='Orders')
-    sale_order_count = fields.Integer(compute='_compute_sale_order_count', readonly=True)
+    sale_order_count = fields.Integer(compute='_compute_sale_order_count', store=True, readonly=True)
 
-    contract_total = fields.Float(compute='_compute_contract_total', string="Contract Price", store=True, tracking=True, digits='Account')
-    contract_tax_total = fields.Float(compute='_compute_contract_tax_total', string="Contract Taxes", digits='Account')
+    contract_total = fields.Float(compute='_compute_contract_totals', string="Contract Price", store=True, tracking=True, digits='Account')
+    contract_tax_total = fields.Float(compute='_compute_contract_totals', string="Contract Taxes", store=True, digits='Account')
 
-    subcontract_ids = fields.One2many('sale.subcontract', 'contract_id', string='Subcontracts', copy=True)
+    subcontract_ids = fields.One2many('sale.subcontract', 'contract_id', string='Subcontracts', copy=True,
+                                      context={'active_test': False})
+    # last number given to a subcontract, empty until the first one is numbered
+    subcontract_sequence = fields.Integer(readonly=True, copy=False)
 
-    external_id = fields.Char(required=False)
+    external_id = fields.Char(required=False, index=True)
     external_balance = fields.Float(required=False)
 
-    @api.depends('contract_line_ids', 'contract_line_ids.quantity', 'contract_line_ids.price_subtotal')
-    def _compute_contract_total(self):
-        for account in self:
-            account.contract_total = sum(line.price_total for line in account.contract_line_ids)
+    # receivable balance of the contract invoices in company currency, kept up to date by
+    # _refresh_receivable_balance when they are posted, reset, cancelled or (un)reconciled
+    amount_invoiced = fields.Float(string='Invoiced', readonly=True, copy=False, digits='Account')
+    amount_paid = fields.Float(string='Paid', readonly=True, copy=False, digits='Account')
+    amount_residual = fields.Float(string='Amount Due', readonly=True, copy=False, digits='Account', index=True)
+    amount_overdue = fields.Float(string='Overdue', readonly=True, copy=False, digits='Account')
+
+    def init(self):
+        # the queue of the recurring invoicing cron: only live recurring contracts are indexed,
+        # so selecting the due ones does not depend on the number of historical contracts
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS sale_contract_recurring_due_index
+            ON sale_contract (recurring_next_date, id)
+            WHERE is_recurring = true AND active = true AND state = 'confirmed'
+        """)
+        self._init_trigram_indexes()
+
+    def _init_trigram_indexes(self):
+        # trigram indexes let the ``ilike`` of _name_search use an index instead of scanning every
+        # contract; pg_trgm has to be installed in the database by its administrator
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if not self.env.cr.fetchone():
+            _logger.info("pg_trgm is not installed, contracts are searched without trigram indexes")
+            return
+        for table, column in (('sale_contract', 'name'), ('sale_contract', 'external_id'), ('res_partner', 'name')):
+            self.env.cr.execute("""
+                CREATE INDEX IF NOT EXISTS {table}_{column}_trgm_index
+                ON {table} USING gin ({column} gin_trgm_ops)
+            """.format(table=table, column=column))
+
+    def _refresh_receivable_balance(self):
+        """
+        Recompute the receivable balance of the contracts from the receivable lines of their
+        posted invoices and credit notes, with one aggregate query for all of them.
+        """
+        if not self.ids:
+            return
+        self.env['account.move.line'].flush(['balance', 'amount_residual', 'date_maturity', 'account_id', 'move_id'])
+        self.env['account.move'].flush(['state', 'move_type', 'contract_id'])
+        for ids in split_every(5000, self.ids, list):
+            self.env.cr.execute("""
+                UPDATE sale_contract c
+                   SET amount_invoiced = COALESCE(b.invoiced, 0),
+                       amount_paid = COALESCE(b.invoiced - b.residual, 0),
+                       amount_residual = COALESCE(b.residual, 0),
+                       amount_overdue = COALESCE(b.overdue, 0)
+                  FROM unnest(%(ids)s) AS ids(id)
+             LEFT JOIN (
+                    SELECT m.contract_id,
+                           SUM(l.balance) AS invoiced,
+                           SUM(l.amount_residual) AS residual,
+                           SUM(CASE WHEN l.date_maturity < %(today)s AND l.amount_residual > 0
+                                    THEN l.amount_residual ELSE 0 END) AS overdue
+                      FROM account_move_line l
+                      JOIN account_move m ON m.id = l.move_id
+                      JOIN account_account a ON a.id = l.account_id
+                     WHERE m.contract_id = ANY(%(ids)s)
+                       AND m.state = 'posted'
+                       AND m.move_type IN ('out_invoice', 'out_refund')
+                       AND a.internal_type = 'receivable'
+                  GROUP BY m.contract_id
+                   ) b ON b.contract_id = ids.id
+                 WHERE c.id = ids.id
+            """, {'ids': ids, 'today': fields.Date.context_today(self)})
+        self.invalidate_cache(['amount_invoiced', 'amount_paid', 'amount_residual', 'amount_overdue'], self.ids)
 
-    @api.depends('contract_line_ids', 'contract_line_ids.quantity', 'contract_line_ids.price_subtotal')
-    def _compute_contract_tax_total(self):
+    @api.model
+    def _cron_refresh_receivable_balance(self):
+        """Move due amounts to overdue as time passes, and fill the balance of contracts that never had one."""
+        self.with_context(active_test=False).search([
+            '|', ('amount_residual', '!=', 0), ('amount_invoiced', '=', False),
+        ])._refresh_receivable_balance()
+
+    @api.depends('contract_line_ids.price_total', 'contract_line_ids.price_tax')
+    def _compute_contract_totals(self):
         for account in self:
-            account.contract_tax_total = sum(line.price_tax for line in account.contract_line_ids)
-
+            lines = account.contract_line_ids
+            account.contract_total = sum(lines.mapped('price_total'))
+            account.contract_tax_total = sum(lines.mapped('price_tax'))
+
+    def _count_by_contract(self, model):
+        """Count the records of ``model`` linked to each contract through ``contract_id``, in one query."""
+        groups = self.env[model].read_group(
+            domain=[('contract_id', 'in', self._origin.ids)],
+            fields=['contract_id'], groupby=['contract_id']
+        )
+        return {group['contract_id'][0]: group['contract_id_count'] for group in groups}
+
+    @api.depends('sale_order_ids')
     def _compute_sale_order_count(self):
+        counts = self._count_by_contract('sale.order')
         for contract in self:
-            contract.sale_order_count = len(contract.sale_order_ids)
+            contract.sale_order_count = counts.get(contract._origin.id, 0)
 
+    @api.depends('invoice_ids')
     def _compute_invoice_count(self):
-        Invoice = self.env['account.move']
-        can_read = Invoice.check_access_rights('read', raise_exception=False)
+        counts = self._count_by_contract('account.move')
         for contract in self:
-            contract.invoice_count = can_read and Invoice.search_count([('contract_id', '=', contract.id)]) or 0
+            contract.invoice_count = counts.get(contract._origin.id, 0)
 
     @api.onchange('partner_id')
     def onchange_partner_id(self):
         if self.partner_id.user_id:
             self.user_id = self.partner_id.user_id
 
+    @api.constrains('recurring_interval')
+    def _check_recurring_interval(self):
+        if any(contract.recurring_interval < 1 for contract in self):
+            raise ValidationError(_('The invoicing period of a contract must be at least 1.'))
+
+    def toggle_active(self):
+        archived = self.filtered(lambda contract: not contract.active)
+        res = super(SaleContract, self).toggle_active()
+        archived.write({'date_archived': False})
+        (self - archived).write({'date_archived': fields.Date.context_today(self)})
+        return res
+
+    @api.model
+    def _get_archive_domain(self, date):
+        """
+        Domain of the contracts finished long enough before ``date`` to be archived: done or
+        cancelled, or ended, without amount due. The delay is the
+        ``sale_contract.archive_delay_days`` parameter (90 days by default).
+        """
+        delay = int(self.env['ir.config_parameter'].sudo().get_param('sale_contract.archive_delay_days', 90))
+        limit = date - relativedelta(days=delay)
+        return [
+            '|', '&', ('state', 'in', ('done', 'cancel')), ('write_date', '<', fields.Datetime.to_string(limit)),
+            ('date_end', '<', limit),
+            '|', ('amount_residual', '=', 0), ('amount_residual', '=', False),
+        ]
+
+    @api.model
+    def _cron_archive_contracts(self):
+        """
+        Archive finished contracts, with their lines and subcontracts, by batches of
+        ``sale_contract.archive_batch_size`` (1000 by default) committed one after the other.
+        Archived contracts are left out of the default searches and of the invoicing, and can
+        still be found with the "Archived" filter.
+        """
+        auto_commit = self.env.context.get('auto_commit', True)
+        batch_size = int(self.env['ir.config_parameter'].sudo().get_param('sale_contract.archive_batch_size', 1000))
+        domain = self._get_archive_domain(fields.Date.context_today(self))
+        Contract = self.with_context(tracking_disable=True)
+        while True:
+            contracts = Contract.search(domain, order='id', limit=batch_size)
+            if not contracts:
+                break
+            contracts.action_archive()
+            if auto_commit:
+                self.env.cr.commit()
+
     def name_get(self):
+        # the date is in the language of the reader, so the name is not stored; contracts
+        # mostly share few dates, each one is formatted once
+        dates = {}
         res = []
         for contract in self.filtered('id'):
-            contract_name = _('№%s of %s') % (contract.name, format_date(self.env, contract.date_start))
+            if contract.date_start not in dates:
+                dates[contract.date_start] = format_date(self.env, contract.date_start)
+            contract_name = _('№%s of %s') % (contract.name, dates[contract.date_start])
             res.append((contract.id, contract_name))
         return res
 
+    @api.model
+    def _name_search(self, name, args=None, operator='ilike', limit=100, name_get_uid=None):
+        args = list(args or [])
+        if name and operator not in expression.NEGATIVE_TERM_OPERATORS:
+            # numbers are displayed as "№<number>"
+            name = name.lstrip('№').strip() or name
+            # the number and the partner are looked up in separate queries: a condition on the
+            # joined partner OR-ed with those of the contract would scan all the contracts
+            domain = expression.AND([['|', ('name', operator, name), ('external_id', operator, name)], args])
+            ids = list(self._search(domain, limit=limit, access_rights_uid=name_get_uid))
+            if not limit or len(ids) < limit:
+                partners = self.env['res.partner'].with_context(active_test=False)._search(
+                    [('name', operator, name)], access_rights_uid=name_get_uid)
+                domain = expression.AND([[('partner_id', 'in', partners), ('id', 'not in', ids)], args])
+                ids += list(self._search(domain, limit=limit and limit - len(ids), access_rights_uid=name_get_uid))
+            return ids
+        return super(SaleContract, self)._name_search(name, args=args, operator=operator, limit=limit, name_get_uid=name_get_uid)
+
+    def _amount_to_words(self, amount):
+        """Spell ``amount``, in the currency of the contract and the language of its partner."""
+        self.ensure_one()
+        return self.env['amount.words'].amount_to_words(amount, self.currency_id, self.partner_id.lang)
+
     def _get_forbidden_state_confirm(self):
         return {'done', 'cancel'}
 
@@ -182,7 +343,107 @@ class SaleContract(models.Model):
         # Return the next day after adding interval
         return recurring_next_date
 
-    def _prepare_invoice_data(self):
+    @api.model
+    def _get_recurring_schedule(self, interval_type, interval, next_date, date_to):
+        """
+        Return the invoice dates of a schedule starting on ``next_date``, up to ``date_to``,
+        each date being computed from the previous one as the recurring run does.
+        """
+        dates = []
+        while next_date <= date_to:
+            dates.append(next_date)
+            following_date = self._get_recurring_next_date(interval_type, interval, next_date, next_date.day)
+            if following_date <= next_date:
+                # a recurrence that does not move forward (interval below 1) has no period to invoice
+                return []
+            next_date = following_date
+        dates.append(next_date)
+        return dates
+
+    def forecast_schedule(self, date_from, date_to):
+        """
+        Forecast the recurring invoices of the contracts (all recurring contracts when called
+        on an empty recordset) with an invoice date between ``date_from`` and ``date_to``.
+        Contracts are read with a single query and the schedules are computed once per
+        distinct (next date, recurrence), so large horizons over many contracts stay cheap.
+        :params date_from: first invoice date of the horizon
+        :params date_to: last invoice date of the horizon
+        :returns: list of dicts with keys contract_id, invoice_date, period_start, period_end, amount
+        """
+        date_from, date_to = fields.Date.to_date(date_from), fields.Date.to_date(date_to)
+        # the contracts the recurring run will invoice, whenever they are due
+        domain = self._get_recurring_contract_domain(fields.Date.context_today(self)) + [
+            ('recurring_next_date', '!=', False),
+        ]
+        if self:
+            domain.append(('id', 'in', self.ids))
+        self.flush(['is_recurring', 'state', 'recurring_next_date', 'recurring_rule_type', 'recurring_interval',
+                    'date_end', 'contract_total'])
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, where_params = query.get_sql()
+        self.env.cr.execute("""
+            SELECT "sale_contract".id, "sale_contract".recurring_next_date, "sale_contract".recurring_rule_type,
+                   "sale_contract".recurring_interval, "sale_contract".date_end, "sale_contract".contract_total
+            FROM {} WHERE {}
+            ORDER BY "sale_contract".id
+        """.format(from_clause, where_clause or 'TRUE'), where_params)
+
+        schedules = {}
+        rows = []
+        for contract_id, next_date, rule, interval, date_end, amount in self.env.cr.fetchall():
+            key = (next_date, rule, interval)
+            if key not in schedules:
+                schedules[key] = self._get_recurring_schedule(rule, interval, next_date, date_to)
+            dates = schedules[key]
+            for invoice_date, following_date in zip(dates, dates[1:]):
+                # the recurring run stops invoicing a contract once its end date is reached
+                if date_end and invoice_date >= date_end:
+                    break
+                if invoice_date < date_from:
+                    continue
+                rows.append({
+                    'contract_id': contract_id,
+                    'invoice_date': invoice_date,
+                    'period_start': invoice_date,
+                    'period_end': following_date - relativedelta(days=1),
+                    'amount': amount,
+                })
+        return rows
+
+    def _get_recurring_invoice_cached(self, key, compute):
+        """
+        Return the value cached under ``key`` for the current recurring run, computing it
+        with ``compute`` on a miss. Outside of a run nothing is cached.
+        Values must not depend on the environment (store ids rather than records).
+        """
+        cache = self.env.context.get('recurring_invoice_cache')
+        if cache is None:
+            return compute()
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    def _prefill_recurring_invoice_cache(self):
+        """Fill the cache of the recurring run with the data of these contracts, in bulk."""
+        cache = self.env.context.get('recurring_invoice_cache')
+        if cache is None or not self:
+            return
+        self.env['sale.order'].flush(['contract_id'])
+        self.env.cr.execute("""
+            SELECT contract_id, max(id) FROM sale_order
+            WHERE contract_id IN %s
+            GROUP BY contract_id
+        """, [tuple(self.ids)])
+        last_orders = dict(self.env.cr.fetchall())
+        for contract in self:
+            cache[('last_sale_order', contract.id)] = last_orders.get(contract.id, False)
+
+    def _prepare_invoice_data(self, next_date=None):
+        """
+        Prepare the values of the invoice of the period starting on ``next_date``
+        (the next invoice date of the contract by default).
+        """
         self.ensure_one()
 
         if not self.partner_id:
@@ -190,27 +451,43 @@ class SaleContract(models.Model):
 
         company = self.env.company or self.company_id
 
-        journal = self.env['account.journal'].search([('type', '=', 'sale'), ('company_id', '=', company.id)], limit=1)
+        journal = self.env['account.journal'].browse(self._get_recurring_invoice_cached(
+            ('sale_journal', company.id),
+            lambda: self.env['account.journal'].search([('type', '=', 'sale'), ('company_id', '=', company.id)], limit=1).id,
+        ))
         if not journal:
             raise UserError(_('Please define a sale journal for the company "%s".') % (company.name or '', ))
 
-        next_date = self.recurring_next_date
+        next_date = next_date or self.recurring_next_date
         if not next_date:
             raise UserError(_('Please define Date of Next Invoice of "%s".') % (self.display_name,))
 
         recurring_next_date = self._get_recurring_next_date(self.recurring_rule_type, self.recurring_interval, next_date, next_date.day)
 
         end_date = fields.Date.from_string(recurring_next_date) - relativedelta(days=1)     # remove 1 day as normal people thinks in term of inclusive ranges.
-        addr = self.partner_id.address_get(['delivery', 'invoice'])
-
-        sale_order = self.env['sale.order'].search([('contract_id', 'in', self.ids)], order="id desc", limit=1)
+        addr = self._get_recurring_invoice_cached(
+            ('address', self.partner_id.id),
+            lambda: self.partner_id.address_get(['delivery', 'invoice']),
+        )
+
+        sale_order = self.env['sale.order'].browse(self._get_recurring_invoice_cached(
+            ('last_sale_order', self.id),
+            lambda: self.env['sale.order'].search([('contract_id', 'in', self.ids)], order="id desc", limit=1).id,
+        ))
         use_sale_order = sale_order and sale_order.partner_id == self.partner_id
         partner_id = sale_order.partner_id.id if use_sale_order else self.partner_id.id or addr['invoice']
         partner_shipping_id = sale_order.partner_id.id if use_sale_order else self.partner_id.id or addr['delivery']
-        fpos = self.env['account.fiscal.position'].with_company(company).get_fiscal_position(self.partner_id.id, partner_shipping_id)
+        fpos = self.env['account.fiscal.position'].browse(self._get_recurring_invoice_cached(
+            ('fiscal_position', company.id, self.partner_id.id, partner_shipping_id),
+            lambda: self.env['account.fiscal.position'].with_company(company).get_fiscal_position(self.partner_id.id, partner_shipping_id).id,
+        ))
 
         narration = _("This invoice covers the following period: %s - %s") % (format_date(self.env, next_date), format_date(self.env, end_date))
-        if self.env['ir.config_parameter'].sudo().get_param('account.use_invoice_terms') and self.company_id.invoice_terms:
+        use_invoice_terms = self._get_recurring_invoice_cached(
+            ('use_invoice_terms',),
+            lambda: self.env['ir.config_parameter'].sudo().get_param('account.use_invoice_terms'),
+        )
+        if use_invoice_terms and self.company_id.invoice_terms:
             narration += '\n' + self.company_id.invoice_terms
         res = {
             'move_type': 'out_invoice',
@@ -225,16 +502,34 @@ class SaleContract(models.Model):
             'invoice_payment_term_id': self.partner_id.property_payment_term_id.id,
             'narration': narration,
             'invoice_user_id': self.user_id.id,
-            'partner_bank_id': company.partner_id.bank_ids.filtered(lambda b: not b.company_id or b.company_id == company)[:1].id,
+            'partner_bank_id': self._get_recurring_invoice_cached(
+                ('partner_bank', company.id),
+                lambda: company.partner_id.bank_ids.filtered(lambda b: not b.company_id or b.company_id == company)[:1].id,
+            ),
         }
 
         return res
 
+    def _get_invoice_line_tax_ids(self, product, company, fiscal_position):
+        """
+        Return the ids of the taxes of ``product`` in ``company``, mapped by the fiscal position.
+        The result is memoized for the whole recurring run.
+        :params product: product.product record
+        :params company: res.company record
+        :params fiscal_position: id of the fiscal position, or False
+        :returns: list of account.tax ids
+        """
+        def compute():
+            tax_ids = product.taxes_id.filtered(lambda t: t.company_id == company)
+            if fiscal_position:
+                tax_ids = self.env['account.fiscal.position'].browse(fiscal_position).map_tax(tax_ids)
+            return tax_ids.ids
+
+        return self._get_recurring_invoice_cached(('taxes', product.id, company.id, fiscal_position or False), compute)
+
     def _prepare_invoice_line(self, line, fiscal_position):
         company = self.env.company or line.analytic_account_id.company_id
-        tax_ids = line.product_id.taxes_id.filtered(lambda t: t.company_id == company)
-        if fiscal_position:
-            tax_ids = self.env['account.fiscal.position'].browse(fiscal_position).map_tax(tax_ids)
+        tax_ids = self._get_invoice_line_tax_ids(line.product_id, company, fiscal_position)
 
         price_unit = line.price_unit
 
@@ -245,80 +540,610 @@ class SaleContract(models.Model):
             'quantity': line.quantity,
             'product_uom_id': line.uom_id.id,
             'product_id': line.product_id.id,
-            'tax_ids': [(6, 0, tax_ids.ids)],
+            'tax_ids': [(6, 0, tax_ids)],
         }
 
     def _prepare_invoice_lines(self, fiscal_position):
         self.ensure_one()
         return [(0, 0, self._prepare_invoice_line(line, fiscal_position)) for line in self.contract_line_ids]
 
-    def _prepare_invoice(self):
-        invoice = self._prepare_invoice_data()
+    def _prepare_invoice(self, next_date=None):
+        invoice = self._prepare_invoice_data(next_date)
         invoice['invoice_line_ids'] = self._prepare_invoice_lines(invoice['fiscal_position_id'])
         return invoice
 
-    def _recurring_create_invoice(self, automatic=False):
+    def _reserve_subcontract_numbers(self, counts):
+        """
+        Reserve subcontract numbers on contracts with a single atomic update of their counter,
+        seeded with their number of subcontracts the first time. Concurrent transactions
+        updating the same contract are serialized by the row lock, so numbers are never reused.
+        :params counts: dict {contract id: number of subcontracts to number}
+        :returns: dict {contract id: list of reserved numbers}
+        """
+        if not counts:
+            return {}
+        self.flush(['subcontract_sequence'])
+        self.env.cr.execute("""
+            UPDATE sale_contract c
+               SET subcontract_sequence = COALESCE(
+                       c.subcontract_sequence,
+                       (SELECT count(*) FROM sale_subcontract s WHERE s.contract_id = c.id)
+                   ) + v.count
+              FROM (VALUES %s) AS v(id, count)
+             WHERE c.id = v.id
+         RETURNING c.id, c.subcontract_sequence
+        """ % ', '.join(['(%s, %s)'] * len(counts)), [value for item in counts.items() for value in item])
+        self.invalidate_cache(['subcontract_sequence'], list(counts))
+        return {
+            contract_id: list(range(last - counts[contract_id] + 1, last + 1))
+            for contract_id, last in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _get_recurring_invoice_batch_size(self):
+        """Number of contracts invoiced together by the recurring run (one create, one commit)."""
+        return int(self.env['ir.config_parameter'].sudo().get_param('sale_contract.recurring_invoice_batch_size', 100))
+
+    @api.model
+    def _get_recurring_contract_domain(self, current_date):
+        """Domain of the contracts the recurring run invoices once due: recurring, confirmed and not ended."""
+        return [
+            ('is_recurring', '=', True),
+            ('state', '=', 'confirmed'),
+            '|', ('date_end', '=', False), ('date_end', '>', current_date),
+        ]
+
+    @api.model
+    def _get_recurring_invoice_domain(self, current_date):
+        """
+        Domain of the contracts the recurring run has to invoice on ``current_date``: due,
+        recurring, confirmed and not ended. It matches ``sale_contract_recurring_due_index``.
+        """
+        return [('recurring_next_date', '<=', current_date)] + self._get_recurring_contract_domain(current_date)
+
+    def _split_by_company(self):
+        """Split the contracts per company, each part in the environment of its company."""
+        sub_data = self.read(fields=['id', 'company_id'])
+        for company_id in set(data['company_id'][0] for data in sub_data):
+            sub_ids = [s['id'] for s in sub_data if s['company_id'][0] == company_id]
+            yield self.with_company(company_id).with_context(company_id=company_id).browse(sub_ids)
+
+    def _recurring_create_invoice(self, automatic=False, batch_size=None):
+        if self.env.context.get('recurring_invoice_cache') is None:
+            # data shared by the invoices of the run is looked up once, and dropped at the end
+            cache = {}
+            try:
+                with self.env['sale.contract.invoice.run']._track(automatic) as stats:
+                    return self.with_context(
+                        recurring_invoice_cache=cache,
+                        recurring_invoice_stats=stats,
+                    )._recurring_create_invoice(automatic, batch_size)
+            finally:
+                cache.clear()
+
         auto_commit = self.env.context.get('auto_commit', True)
         cr = self.env.cr
         invoices = self.env['account.move']
         current_date = datetime.date.today()
+        batch_size = batch_size or self._get_recurring_invoice_batch_size()
 
         if len(self) > 0:
             subscriptions = self
+        elif automatic:
+            return self._recurring_create_invoice_claimed(batch_size, current_date)
         else:
-            domain = [('recurring_next_date', '<=', current_date)]
+            domain = self._get_recurring_invoice_domain(current_date)
             subscriptions = self.search(domain)
 
-        if subscriptions:
-            sub_data = subscriptions.read(fields=['id', 'company_id'])
-            for company_id in set(data['company_id'][0] for data in sub_data):
-                sub_ids = [s['id'] for s in sub_data if s['company_id'][0] == company_id]
-                subs = self.with_company(company_id).with_context(company_id=company_id).browse(sub_ids)
-                Invoice = self.env['account.move'].with_context(move_type='out_invoice', company_id=company_id).with_company(company_id)
-                for subscription in subs:
-                    subscription = subscription[0]
-                    if automatic and auto_commit:
-                        cr.commit()
-
-                    # if we reach the end date of the subscription then we skip it
-                    if automatic and subscription.date_end and subscription.date_end <= current_date:
+        for subs in subscriptions._split_by_company():
+            for chunk in split_every(batch_size, subs.ids, subs.browse):
+                invoices += chunk._recurring_create_invoice_batch(automatic, current_date)
+                if automatic and auto_commit:
+                    cr.commit()
+        return invoices
+
+    @api.model
+    def _claim_recurring_contracts(self, domain, limit):
+        """
+        Lock and return up to ``limit`` contracts matching ``domain`` that are not locked yet.
+        The locks are held until the end of the transaction, rows locked by another
+        transaction are skipped instead of waited for.
+        """
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, where_params = query.get_sql()
+        self.env.cr.execute("""
+            SELECT "sale_contract".id FROM {}
+            WHERE {}
+            ORDER BY "sale_contract".id
+            LIMIT %s
+            FOR UPDATE OF "sale_contract" SKIP LOCKED
+        """.format(from_clause, where_clause or 'TRUE'), where_params + [limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _recurring_create_invoice_claimed(self, batch_size, current_date):
+        """
+        Worker mode of the recurring run: claim chunks of due contracts and invoice them
+        until none is left. Several crons or job runners can run it at the same time, a
+        chunk locked by a worker is skipped by the others until its commit, after which
+        its contracts are not due anymore.
+        :params batch_size: number of contracts claimed at once
+        :params current_date: date of the run
+        :returns: created invoices
+        """
+        auto_commit = self.env.context.get('auto_commit', True)
+        cr = self.env.cr
+        invoices = self.env['account.move']
+        domain = self._get_recurring_invoice_domain(current_date)
+        # each worker walks the contracts once by increasing id, so that contracts still due
+        # after their chunk (skipped, failed or late by several periods) are not claimed again
+        last_id = 0
+        tries = 0
+        while True:
+            try:
+                chunk = self._claim_recurring_contracts(domain + [('id', '>', last_id)], batch_size)
+            except psycopg2.OperationalError as e:
+                # another worker committed a contract of the chunk after our snapshot was taken
+                if e.pgcode not in PG_CONCURRENCY_ERRORS_TO_RETRY or tries >= MAX_TRIES_ON_CONCURRENCY_FAILURE:
+                    raise
+                cr.rollback()
+                tries += 1
+                continue
+            tries = 0
+            if not chunk:
+                break
+
+            last_id = max(chunk.ids)
+            for subs in chunk._split_by_company():
+                invoices += subs._recurring_create_invoice_batch(True, current_date)
+            if auto_commit:
+                cr.commit()
+        return invoices
+
+    def _get_recurring_invoice_dates(self, current_date, limit):
+        """
+        Return the dates of the periods to invoice for the contract: its next invoice date and,
+        when catching up (``limit`` > 1), the following periods already due on ``current_date``,
+        at most ``limit`` of them and never from its end date on.
+        """
+        self.ensure_one()
+        invoice_dates = [self.recurring_next_date]
+        next_date = self.recurring_next_date
+        while len(invoice_dates) < limit:
+            previous_date = next_date
+            next_date = self._get_recurring_next_date(self.recurring_rule_type, self.recurring_interval, next_date, next_date.day)
+            # a recurrence that does not move forward would invoice the same period again
+            if next_date <= previous_date or next_date > current_date or (self.date_end and next_date >= self.date_end):
+                break
+            invoice_dates.append(next_date)
+        return invoice_dates
+
+    @api.model
+    def _get_recurring_invoice_catch_up_limit(self):
+        """
+        Maximum number of periods invoiced per contract by a run. It is 1 unless the catch-up
+        mode is enabled, through the ``recurring_catch_up`` context key or the
+        ``sale_contract.recurring_invoice_catch_up`` system parameter.
+        """
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        catch_up = self.env.context.get('recurring_catch_up')
+        if catch_up is None:
+            catch_up = str2bool(get_param('sale_contract.recurring_invoice_catch_up', 'False'))
+        if not catch_up:
+            return 1
+        return int(get_param('sale_contract.recurring_invoice_catch_up_limit', 120))
+
+    @contextmanager
+    def _recurring_invoice_stage(self, stage):
+        """Measure a stage of the recurring run, when the run is recorded."""
+        stats = self.env.context.get('recurring_invoice_stats')
+        if stats is None:
+            yield
+        else:
+            with stats.stage(stage):
+                yield
+
+    def _recurring_create_invoice_batch(self, automatic, current_date):
+        """
+        Create the recurring invoices of a chunk of contracts sharing the same company.
+        The invoices of the whole chunk are created at once; if that fails, the chunk is
+        replayed contract by contract in their own savepoint so only the faulty ones are lost.
+        :params automatic: errors are logged and skipped instead of raised
+        :params current_date: date of the run
+        :returns: created invoices
+        """
+        self._prefill_recurring_invoice_cache()
+        catch_up_limit = self._get_recurring_invoice_catch_up_limit()
+        to_invoice = []
+        errors = {}
+        skipped = self.browse()
+        with self._recurring_invoice_stage('prepare'):
+            for subscription in self:
+                # if we reach the end date of the subscription then we skip it
+                if automatic and subscription.date_end and subscription.date_end <= current_date:
+                    skipped |= subscription
+                    continue
+
+                try:
+                    if subscription.date_end and subscription.recurring_next_date >= subscription.date_end:
+                        skipped |= subscription
                         continue
+                    contract = subscription.with_context(lang=subscription.partner_id.lang)
+                    to_invoice.extend([
+                        (subscription, invoice_date, contract._prepare_invoice(invoice_date))
+                        for invoice_date in subscription._get_recurring_invoice_dates(current_date, catch_up_limit)
+                    ])
+                except Exception as e:
+                    if not automatic:
+                        raise
+                    _logger.exception('Fail to create recurring invoice for contract %s', subscription.name)
+                    errors[subscription] = str(e)
 
-                    # invoice only
-                    try:
-                        if subscription.date_end and subscription.recurring_next_date >= subscription.date_end:
-                            return
-
-                        invoice_values = subscription.with_context(lang=subscription.partner_id.lang)._prepare_invoice()
-                        new_invoice = Invoice.create(invoice_values)
-                        new_invoice.message_post_with_view(
-                            'mail.message_origin_link',
-                            values={'self': new_invoice, 'origin': subscription},
-                            subtype_id=self.env.ref('mail.mt_note').id)
-                        invoices += new_invoice
-
-                        next_date = subscription.recurring_next_date or current_date
-                        rule, interval = subscription.recurring_rule_type, subscription.recurring_interval
-                        new_date = subscription._get_recurring_next_date(rule, interval, next_date,
-                                                                         next_date.day)
-                        # When `recurring_next_date` is updated by cron or by `Generate Invoice` action button,
-                        # write() will skip resetting `recurring_invoice_day` value based on this context value
-                        subscription.with_context(skip_update_recurring_invoice_day=True).write(
-                            {'recurring_next_date': new_date})
-                        if automatic and auto_commit:
-                            cr.commit()
-                    except Exception as e:
-                        if automatic and auto_commit:
-                            cr.rollback()
-                            _logger.exception('Fail to create recurring invoice for contract %s', subscription.name)
-                        else:
-                            raise
+        invoices = self.env['account.move']
+        if to_invoice:
+            invoices, create_errors = self._create_recurring_invoices_isolated(to_invoice, automatic)
+            errors.update(create_errors)
+
+        stats = self.env.context.get('recurring_invoice_stats')
+        if stats is not None:
+            invoice_counts = defaultdict(int)
+            for invoice in invoices:
+                invoice_counts[invoice.contract_id] += 1
+            stats.save(
+                [(contract.id, 'skipped', 0, False) for contract in skipped]
+                + [(contract.id, 'failed', 0, message) for contract, message in errors.items()]
+                + [(contract.id, 'invoiced', count, False) for contract, count in invoice_counts.items()]
+            )
         return invoices
 
+    def _create_recurring_invoices_isolated(self, to_invoice, automatic):
+        """
+        Create the prepared invoices all at once, or contract by contract in their own savepoint
+        when that fails, so that a faulty contract does not prevent the others from being invoiced.
+        :params to_invoice: list of (contract, invoice date, invoice values)
+        :params automatic: errors are logged and returned instead of raised
+        :returns: (created invoices, dict {contract: error message})
+        """
+        try:
+            with self.env.cr.savepoint():
+                return self._create_recurring_invoices(to_invoice), {}
+        except Exception as e:
+            if not automatic:
+                raise
+            if len(set(subscription for subscription, __, __ in to_invoice)) == 1:
+                _logger.exception('Fail to create recurring invoice for contract %s', to_invoice[0][0].name)
+                return self.env['account.move'], {to_invoice[0][0]: str(e)}
+
+        to_invoice_by_contract = defaultdict(list)
+        for item in to_invoice:
+            to_invoice_by_contract[item[0]].append(item)
+        invoices = self.env['account.move']
+        errors = {}
+        for subscription, contract_to_invoice in to_invoice_by_contract.items():
+            try:
+                with self.env.cr.savepoint():
+                    invoices += self._create_recurring_invoices(contract_to_invoice)
+            except Exception as e:
+                _logger.exception('Fail to create recurring invoice for contract %s', subscription.name)
+                errors[subscription] = str(e)
+        return invoices, errors
+
+    def _create_recurring_invoices(self, to_invoice):
+        """
+        Create the invoices prepared for some contracts and move their next invoice date after
+        the last period invoiced.
+        :params to_invoice: list of (contract, invoice date, invoice values), by date for a contract
+        :returns: created invoices, in the order of ``to_invoice``
+        """
+        Invoice = self.env['account.move'].with_context(move_type='out_invoice')
+        with self._recurring_invoice_stage('create'):
+            new_invoices = Invoice.create([invoice_values for __, __, invoice_values in to_invoice])
+
+        with self._recurring_invoice_stage('chatter'):
+            if self._get_recurring_invoice_deferred_notes():
+                # in the savepoint of the invoices: a failure is isolated like any other
+                self._post_recurring_invoice_notes(new_invoices)
+            else:
+                for (subscription, __, __), new_invoice in zip(to_invoice, new_invoices):
+                    new_invoice.message_post_with_view(
+                        'mail.message_origin_link',
+                        values={'self': new_invoice, 'origin': subscription},
+                        subtype_id=self.env.ref('mail.mt_note').id)
+
+        with self._recurring_invoice_stage('advance'):
+            new_dates = {}
+            for subscription, invoice_date, __ in to_invoice:
+                rule, interval = subscription.recurring_rule_type, subscription.recurring_interval
+                new_dates[subscription] = subscription._get_recurring_next_date(rule, interval, invoice_date, invoice_date.day)
+
+            contract_ids_by_date = defaultdict(list)
+            for subscription, new_date in new_dates.items():
+                contract_ids_by_date[new_date].append(subscription.id)
+            for new_date, contract_ids in contract_ids_by_date.items():
+                # When `recurring_next_date` is updated by cron or by `Generate Invoice` action button,
+                # write() will skip resetting `recurring_invoice_day` value based on this context value
+                self.browse(contract_ids).with_context(skip_update_recurring_invoice_day=True).write(
+                    {'recurring_next_date': new_date})
+        return new_invoices
+
+    @api.model
+    def _get_recurring_invoice_deferred_notes(self):
+        """
+        Whether the origin notes of recurring invoices are logged in bulk once the invoices of a
+        chunk are created (``recurring_invoice_deferred_notes`` context key, defaulting to the
+        ``sale_contract.recurring_invoice_deferred_notes`` parameter) rather than one by one.
+        """
+        if 'recurring_invoice_deferred_notes' in self.env.context:
+            return self.env.context['recurring_invoice_deferred_notes']
+        return self._get_recurring_invoice_cached('deferred_notes', lambda: str2bool(
+            self.env['ir.config_parameter'].sudo().get_param('sale_contract.recurring_invoice_deferred_notes', 'False')))
+
+    @api.model
+    def _post_recurring_invoice_notes(self, invoices):
+        """
+        Log on ``invoices`` the note linking them to their contract, like ``message_post_with_view``
+        with ``mail.message_origin_link`` would. The template is rendered once without origin and
+        the link to each contract inserted in it, and the messages are created in one batch.
+        Internal notes notify nobody, so nothing else is done by posting them one by one.
+        """
+        view = self.env.ref('mail.message_origin_link')
+        body = ustr(view._render({'self': invoices[:1], 'object': invoices[:1], 'origin': self.browse()},
+                                 engine='ir.qweb', minimal_qcontext=True))
+        head, closing, tail = body.rpartition('</p>')
+        if not closing:
+            # customized template, render it for each invoice
+            for invoice in invoices:
+                invoice.message_post_with_view(
+                    view, values={'self': invoice, 'origin': invoice.contract_id},
+                    subtype_id=self.env.ref('mail.mt_note').id)
+            return self.env['mail.message']
+
+        author = self.env.user.partner_id
+        email_from = author.email_formatted
+        reply_to = invoices._notify_get_reply_to(default=email_from)
+        subtype_id = self.env['ir.model.data'].xmlid_to_res_id('mail.mt_note')
+        link = '<a href="#" data-oe-model="%s" data-oe-id="%%s"> %%s</a>' % self._name
+        return self.env['mail.message'].sudo().create([{
+            'model': invoice._name,
+            'res_id': invoice.id,
+            'record_name': invoice.display_name,
+            'body': head + link % (invoice.contract_id.id, html_escape(invoice.contract_id.display_name)) + closing + tail,
+            'message_type': 'comment',
+            'subtype_id': subtype_id,
+            'author_id': author.id,
+            'email_from': email_from,
+            'reply_to': reply_to.get(invoice.id),
+        } for invoice in invoices])
+
     @api.model
     def _cron_recurring_create_invoice(self):
+        """
+        Recurring invoicing cron. Due contracts are claimed chunk by chunk with row locks,
+        so the job can be duplicated (several ``ir.cron`` records or job runners calling
+        this method) to spread the invoicing over several workers.
+        """
         return self._recurring_create_invoice(automatic=True)
 
+    def _get_recurring_invoice_preview(self, current_date):
+        """
+        Prepare the invoices the recurring run would create for the contracts on ``current_date``,
+        without creating them, and summarize each of them. Taxes are computed once per group of
+        identical lines, like in ``SaleContractLine._compute_amount``.
+        The contracts are expected to be of the company of the environment, which sets the
+        journal, taxes and fiscal position of the invoices (see ``_split_by_company``).
+        :returns: list of dicts with the contract_id, partner_id, company_id, journal_id,
+            currency_id, invoice_date, line_count, amount_untaxed, amount_tax and amount_total
+            of each invoice, and an error message for the contracts that cannot be invoiced
+        """
+        self._prefill_recurring_invoice_cache()
+        catch_up_limit = self._get_recurring_invoice_catch_up_limit()
+        Tax = self.env['account.tax']
+        tax_keys = {}
+        amounts = {}
+        rows = []
+        for subscription in self:
+            # same selection as the run
+            if subscription.date_end and (subscription.date_end <= current_date
+                                          or subscription.recurring_next_date >= subscription.date_end):
+                continue
+            row = {
+                'contract_id': subscription.id,
+                'partner_id': subscription.partner_id.id,
+                'company_id': subscription.company_id.id,
+                'currency_id': subscription.currency_id.id,
+            }
+            try:
+                contract = subscription.with_context(lang=subscription.partner_id.lang)
+                invoice_dates = subscription._get_recurring_invoice_dates(current_date, catch_up_limit)
+                invoices = [contract._prepare_invoice(invoice_date) for invoice_date in invoice_dates]
+            except Exception as e:
+                rows.append(dict(row, error=str(e)))
+                continue
+
+            for invoice in invoices:
+                currency = self.env['res.currency'].browse(invoice['currency_id'])
+                partner = self.env['res.partner'].browse(invoice['partner_id'])
+                amount_untaxed = amount_total = 0.0
+                for __, __, line in invoice['invoice_line_ids']:
+                    taxes = Tax.browse(line['tax_ids'][0][2])
+                    if taxes not in tax_keys:
+                        flat_taxes = taxes.flatten_taxes_hierarchy()
+                        tax_keys[taxes] = any(tax.amount_type not in ('percent', 'fixed', 'division') for tax in flat_taxes)
+                    price = line['price_unit'] * (1 - (line['discount'] or 0.0) / 100.0)
+                    key = (tuple(sorted(taxes.ids)), currency.id, price, line['quantity'])
+                    if tax_keys[taxes]:
+                        key += (line['product_id'], partner.id)
+                    if key not in amounts:
+                        taxes_res = taxes.compute_all(price, currency, line['quantity'],
+                                                      product=self.env['product.product'].browse(line['product_id']),
+                                                      partner=partner)
+                        amounts[key] = (taxes_res['total_excluded'], taxes_res['total_included'])
+                    amount_untaxed += amounts[key][0]
+                    amount_total += amounts[key][1]
+                rows.append(dict(
+                    row,
+                    partner_id=partner.id,
+                    journal_id=invoice['journal_id'],
+                    currency_id=currency.id,
+                    invoice_date=invoice['invoice_date'],
+                    line_count=len(invoice['invoice_line_ids']),
+                    amount_untaxed=amount_untaxed,
+                    amount_tax=amount_total - amount_untaxed,
+                    amount_total=amount_total,
+                ))
+        return rows
+
+    def _get_recurring_invoice_preview_isolated(self, current_date):
+        """Preview the contracts in a cursor of their own, rolled back: meant to run in a worker thread."""
+        with api.Environment.manage(), self.pool.cursor() as cr:
+            try:
+                # the context carries the company of the contracts
+                env = api.Environment(cr, self.env.uid, dict(self.env.context, recurring_invoice_cache={}), self.env.su)
+                return self.with_env(env)._get_recurring_invoice_preview(current_date)
+            finally:
+                cr.rollback()
+
+    @api.model
+    def _preview_recurring_invoices(self, current_date=None, contract_ids=None, workers=None):
+        """
+        Dry run of the recurring invoicing: prepare the invoices the run would create on
+        ``current_date`` for the due contracts (all of them, or those of ``contract_ids``)
+        without creating anything. Due contracts are split by company and in chunks of the run
+        batch size, like in the run, and previewed by a pool of ``workers`` threads
+        (``sale_contract.recurring_preview_workers``, 4 by default), each chunk in its own cursor.
+        The threads only overlap the database round trips of the chunks, the preparation of the
+        invoices holds the GIL.
+        :returns: generator of the rows of ``_get_recurring_invoice_preview``, by chunk in the
+            order of the companies and contracts, as soon as their chunk is done
+        """
+        current_date = current_date or datetime.date.today()
+        domain = self._get_recurring_invoice_domain(current_date)
+        if contract_ids is not None:
+            domain = expression.AND([domain, [('id', 'in', list(contract_ids))]])
+        batch_size = self._get_recurring_invoice_batch_size()
+        chunks = [
+            chunk
+            for subs in self.search(domain, order='id')._split_by_company()
+            for chunk in split_every(batch_size, subs.ids, subs.browse)
+        ]
+        if workers is None:
+            workers = int(self.env['ir.config_parameter'].sudo().get_param('sale_contract.recurring_preview_workers', 4))
+
+        if workers <= 1 or len(chunks) <= 1 or self.pool.in_test_mode():
+            # other cursors would not see the data of this transaction in tests
+            for chunk in chunks:
+                yield from chunk.with_context(recurring_invoice_cache={})._get_recurring_invoice_preview(current_date)
+            return
+
+        # the workers see the committed data, like the cron
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for rows in executor.map(lambda chunk: chunk._get_recurring_invoice_preview_isolated(current_date), chunks):
+                yield from rows
+
+    @api.model
+    def upsert_external(self, records, batch_size=500):
+        """
+        Create or update contracts, with their lines and subcontracts, identified by their
+        ``external_id``. Records are processed by batches: the external ids of a batch are
+        resolved with one query per model, the new contracts are created together and a
+        faulty record only fails itself.
+        :params records: list of dicts of contract values with an ``external_id``. Lines and
+            subcontracts may be given in ``contract_line_ids`` and ``subcontract_ids`` as lists of
+            dicts of values with an ``external_id``: existing ones are updated, the others created.
+        :params batch_size: number of records processed together
+        :returns: list of dicts with keys external_id, id and status (created, updated or error),
+            and the error message for failed records, in the order of ``records``
+        """
+        results = []
+        for batch in split_every(batch_size, records, list):
+            results += self._upsert_external_batch(batch)
+        return results
+
+    @api.model
+    def _get_by_external_id(self, model, external_ids):
+        """Return {external_id: record} of the records of ``model`` with the given external ids."""
+        # an empty external id would match every record without one
+        external_ids = {external_id for external_id in external_ids if external_id}
+        if not external_ids:
+            return {}
+        records = self.env[model].with_context(active_test=False).search([('external_id', 'in', list(external_ids))])
+        return {record.external_id: record for record in records}
+
+    @api.model
+    def _upsert_external_batch(self, records):
+        # records without external id cannot be matched, they fail alone
+        invalid = {'id': False, 'status': 'error', 'error': _('The external id of the contract is missing.')}
+        # the last values given for an external id win
+        records_by_external_id = {values['external_id']: values for values in records if values.get('external_id')}
+        contracts = self._get_by_external_id('sale.contract', list(records_by_external_id))
+        children = {}
+        for model, fname in (('sale.contract.line', 'contract_line_ids'), ('sale.subcontract', 'subcontract_ids')):
+            external_ids = [
+                child['external_id']
+                for values in records_by_external_id.values() for child in values.get(fname) or []
+                if child.get('external_id')
+            ]
+            children[fname] = self._get_by_external_id(model, external_ids)
+
+        to_create, to_write = [], []
+        for external_id, values in records_by_external_id.items():
+            contract_id = contracts[external_id].id if external_id in contracts else False
+            values = dict(values)
+            for fname, existing in children.items():
+                if fname not in values:
+                    continue
+                commands = []
+                for child in values[fname] or []:
+                    record = existing.get(child.get('external_id'))
+                    if contract_id and record and record.contract_id.id == contract_id:
+                        commands.append((1, record.id, child))
+                    else:
+                        commands.append((0, 0, child))
+                values[fname] = commands
+            if contract_id:
+                to_write.append((external_id, contract_id, values))
+            else:
+                to_create.append((external_id, values))
+
+        results = {}
+        if to_create:
+            try:
+                with self.env.cr.savepoint():
+                    created = self.create([values for __, values in to_create])
+                for (external_id, __), contract in zip(to_create, created):
+                    results[external_id] = {'id': contract.id, 'status': 'created'}
+            except Exception:
+                # find the faulty records
+                for external_id, values in to_create:
+                    try:
+                        with self.env.cr.savepoint():
+                            results[external_id] = {'id': self.create(values).id, 'status': 'created'}
+                    except Exception as e:
+                        results[external_id] = {'id': False, 'status': 'error', 'error': str(e)}
+
+        if to_write:
+            try:
+                with self.env.cr.savepoint():
+                    for external_id, contract_id, values in to_write:
+                        self.browse(contract_id).write(values)
+                for external_id, contract_id, __ in to_write:
+                    results[external_id] = {'id': contract_id, 'status': 'updated'}
+            except Exception:
+                for external_id, contract_id, values in to_write:
+                    try:
+                        with self.env.cr.savepoint():
+                            self.browse(contract_id).write(values)
+                        results[external_id] = {'id': contract_id, 'status': 'updated'}
+                    except Exception as e:
+                        results[external_id] = {'id': contract_id, 'status': 'error', 'error': str(e)}
+
+        return [
+            dict(results[values['external_id']], external_id=values['external_id'])
+            if values.get('external_id') else dict(invalid, external_id=values.get('external_id', False))
+            for values in records
+        ]
+
     def action_subscription_invoice(self):
         self.ensure_one()
         invoices = self.env['account.move'].search([('contract_id', 'in', self.ids)])
@@ -351,6 +1176,7 @@ class SaleContractLine(models.Model):
         'product.product', string='Product', check_company=True, required=True)
     categ_id = fields.Many2one(related='product_id.categ_id', required=False, readonly=True)
     contract_id = fields.Many2one('sale.contract', string='Contract', ondelete='cascade')
+    active = fields.Boolean(related='contract_id.active', store=True)
     company_id = fields.Many2one('res.company', related='contract_id.company_id', stored=True, index=True)
     name = fields.Text(string='Description', required=True)
     quantity = fields.Float(string='Quantity', help="Quantity that will be invoiced.", default=1.0, digits='Product Unit of Measure')
@@ -365,21 +1191,43 @@ class SaleContractLine(models.Model):
     price_tax = fields.Float(compute='_compute_amount', string='Total Tax', digits='Account', readonly=True, store=True)
     price_total = fields.Float(compute='_compute_amount', string='Total', digits='Account', readonly=True, store=True)
 
-    external_id = fields.Char(required=False)
+    external_id = fields.Char(required=False, index=True)
+    sale_line_id = fields.Many2one('sale.order.line', string='Sale Order Line', index=True, copy=False)
 
     @api.depends('quantity', 'discount', 'price_unit', 'tax_id')
     def _compute_amount(self):
         """
         Compute the amounts of the SO line.
+        Lines are grouped by taxes (with their price included flags), currency, price and
+        quantity, and ``compute_all`` runs once per group. Product and partner only take
+        part in the grouping when a tax computes its amount with code.
         """
+        tax_keys = {}
+        amounts = {}
         for line in self:
+            taxes = line.tax_id
+            if taxes not in tax_keys:
+                flat_taxes = taxes.flatten_taxes_hierarchy()
+                tax_keys[taxes] = (
+                    tuple(sorted(taxes.ids)),
+                    tuple(flat_taxes.sorted('id').mapped('price_include')),
+                    any(tax.amount_type not in ('percent', 'fixed', 'division') for tax in flat_taxes),
+                )
+            tax_ids, price_include, by_record = tax_keys[taxes]
+            contract = line.contract_id
             price = line.price_unit * (1 - (line.discount or 0.0) / 100.0)
-            taxes = line.tax_id.compute_all(price, line.contract_id.currency_id, line.quantity, product=line.product_id, partner=line.contract_id.partner_id)
-            line.update({
-                'price_tax': sum(t.get('amount', 0.0) for t in taxes.get('taxes', [])),
-                'price_total': taxes['total_included'],
-                'price_subtotal': taxes['total_excluded'],
-            })
+            key = (tax_ids, price_include, contract.currency_id.id, price, line.quantity)
+            if by_record:
+                key += (line.product_id.id, contract.partner_id.id)
+
+            if key not in amounts:
+                taxes_res = taxes.compute_all(price, contract.currency_id, line.quantity, product=line.product_id, partner=contract.partner_id)
+                amounts[key] = {
+                    'price_tax': sum(t.get('amount', 0.0) for t in taxes_res.get('taxes', [])),
+                    'price_total': taxes_res['total_included'],
+                    'price_subtotal': taxes_res['total_excluded'],
+                }
+            line.update(amounts[key])
 
     @api.onchange('product_id')
     def onchange_product_id(self):
@@ -436,13 +1284,115 @@ class SaleContractLine(models.Model):
         else:
             return self.onchange_product_quantity()
 
-    @api.model
-    def create(self, values):
-        if values.get('product_id') and not values.get('name'):
-            line = self.new(values)
-            line.onchange_product_id()
-            values['name'] = line._fields['name'].convert_to_write(line['name'], line)
-        return super(SaleContractLine, self).create(values)
+    def _get_repriced_values(self):
+        """
+        Compute the price of the lines from the pricelist of their contract, like
+        ``onchange_product_quantity`` does for one line, for many lines at once: the pricelist
+        rules are evaluated with one ``_compute_price_rule`` call per pricelist, company and
+        quantity for all the products concerned, and currency rates are fetched once per
+        currency pair. Lines without product are left aside.
+        :returns: dict {line: values to write}, for the lines whose price changes
+        """
+        today = fields.Date.context_today(self)
+        precision = self.env['decimal.precision'].precision_get('Product Price')
+        lines = self.filtered('product_id')
+
+        products_by_key = defaultdict(set)
+        for line in lines:
+            contract = line.contract_id
+            products_by_key[contract.pricelist_id, contract.company_id, line.quantity].add(line.product_id)
+        prices = {}
+        for (pricelist, company, quantity), products in products_by_key.items():
+            results = pricelist.with_company(company)._compute_price_rule(
+                [(product, quantity, False) for product in products], date=today)
+            for product_id, (price, __) in results.items():
+                prices[pricelist, company, quantity, product_id] = price
+
+        rates = {}
+
+        def convert(amount, from_currency, to_currency, company):
+            key = (from_currency, to_currency, company)
+            if key not in rates:
+                rates[key] = from_currency._get_conversion_rate(from_currency, to_currency, company, today)
+            return to_currency.round(amount * rates[key])
+
+        result = {}
+        for line in lines:
+            contract = line.contract_id
+            pricelist, product = contract.pricelist_id, line.product_id.with_company(contract.company_id)
+            price = prices[pricelist, contract.company_id, line.quantity, product.id]
+            values = {}
+            if pricelist.discount_policy == 'without_discount':
+                if pricelist.currency_id != product.currency_id:
+                    company = product.product_tmpl_id._get_current_company(pricelist=pricelist)
+                    price_unit = convert(product.lst_price, product.currency_id, pricelist.currency_id, company)
+                else:
+                    price_unit = product.lst_price
+                if float_compare(price_unit, price, precision_rounding=pricelist.currency_id.rounding) == 1:
+                    values['discount'] = (price_unit - price) / price_unit * 100
+                else:
+                    values['discount'] = 0.0
+            else:
+                price_unit = price
+
+            uom = line.uom_id
+            if not uom or product.uom_id.category_id != uom.category_id:
+                uom = product.uom_id
+                values['uom_id'] = uom.id
+            if uom != product.uom_id:
+                price_unit = product.uom_id._compute_price(price_unit, uom)
+            values['price_unit'] = price_unit
+
+            changed = (
+                float_compare(line.price_unit, values['price_unit'], precision_digits=precision)
+                or float_compare(line.discount, values.get('discount', line.discount), precision_digits=2)
+                or line.uom_id.id != values.get('uom_id', line.uom_id.id)
+            )
+            if changed:
+                result[line] = values
+        return result
+
+    def _reprice(self, dry_run=False):
+        """
+        Update the price of the lines from the pricelist of their contract. Lines getting the
+        same values are written together.
+        :params dry_run: only compute the new prices, without writing them
+        :returns: list of dicts with the line id, its current and new price and discount
+        """
+        repriced = self._get_repriced_values()
+        changes = [{
+            'line_id': line.id,
+            'old_price_unit': line.price_unit,
+            'old_discount': line.discount,
+            'price_unit': values['price_unit'],
+            'discount': values.get('discount', line.discount),
+        } for line, values in repriced.items()]
+        if not dry_run:
+            line_ids_by_values = defaultdict(list)
+            for line, values in repriced.items():
+                line_ids_by_values[tuple(sorted(values.items()))].append(line.id)
+            for values, line_ids in line_ids_by_values.items():
+                self.browse(line_ids).write(dict(values))
+        return changes
+
+    def _get_changed_values(self, values):
+        """Return the part of ``values`` (as given to ``write``) that differs from the line."""
+        self.ensure_one()
+        changed_values = {}
+        for fname, value in values.items():
+            field = self._fields[fname]
+            if field.convert_to_record(field.convert_to_cache(value, self), self) != self[fname]:
+                changed_values[fname] = value
+        return changed_values
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for values in vals_list:
+            if values.get('product_id') and not values.get('name'):
+                line = self.new(values)
+                line.onchange_product_id()
+                values['name'] = line._fields['name'].convert_to_write(line['name'], line)
+        return super(SaleContractLine, self).create(vals_list)
 
 
 class SaleSubContractType(models.Model):
@@ -453,9 +1403,10 @@ class SaleSubContractType(models.Model):
 class SaleSubContract(models.Model):
     _name = "sale.subcontract"
     contract_id = fields.Many2one('sale.contract', string='Contract', ondelete='cascade')
+    active = fields.Boolean(related='contract_id.active', store=True)
     sale_order_id = fields.Many2one('sale.order', string='Parent Sale Order', ondelete='cascade')
     subcontract_type = fields.Many2one('sale.subcontract.type', string='Subcontract type')
 
     name = fields.Char(string='Name', required=True, tracking=True)
 
-    external_id = fields.Integer(required=False)
+    external_id = fields.Integer(required=False, index=True)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+STAGES = ['prepare', 'create', 'chatter', 'advance']
+
+
+class InvoiceRunStats(object):
+    """Metrics of a recurring invoicing run, collected in memory and saved on its record."""
+
+    def __init__(self, run):
+        self.run = run
+        self.timings = defaultdict(float)
+        self.queries = defaultdict(int)
+        self.counts = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        cr = self.run.env.cr
+        time0, count0 = time.perf_counter(), cr.sql_log_count
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - time0
+            self.queries[name] += cr.sql_log_count - count0
+
+    def save(self, results):
+        """
+        Save the results of a chunk of contracts and the metrics collected so far.
+        :param results: list of (contract id, result, number of invoices, message)
+        """
+        for __, result, invoice_count, __ in results:
+            self.counts[result] += 1
+            self.counts['invoice'] += invoice_count
+        self.run.env['sale.contract.invoice.run.line'].create([{
+            'run_id': self.run.id,
+            'contract_id': contract_id,
+            'result': result,
+            'invoice_count': invoice_count,
+            'message': message,
+        } for contract_id, result, invoice_count, message in results])
+        self.run.write(self._get_values())
+
+    def _get_values(self):
+        values = {
+            'contract_count': sum(self.counts[result] for result in ('invoiced', 'skipped', 'failed')),
+            'invoiced_count': self.counts['invoiced'],
+            'skipped_count': self.counts['skipped'],
+            'failed_count': self.counts['failed'],
+            'invoice_count': self.counts['invoice'],
+        }
+        for stage in STAGES:
+            values['%s_time' % stage] = self.timings[stage]
+            values['%s_queries' % stage] = self.queries[stage]
+        return values
+
+
+class SaleContractInvoiceRun(models.Model):
+    _name = "sale.contract.invoice.run"
+    _description = "Recurring Invoicing Run"
+    _order = "date_start desc, id desc"
+    _rec_name = "date_start"
+
+    date_start = fields.Datetime(string='Start', required=True, readonly=True, default=fields.Datetime.now)
+    date_end = fields.Datetime(string='End', readonly=True)
+    duration = fields.Float(string='Duration (s)', readonly=True, group_operator='avg')
+    state = fields.Selection([
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', required=True, readonly=True, default='running')
+    error = fields.Text(readonly=True)
+
+    contract_count = fields.Integer(string='Processed Contracts', readonly=True)
+    invoiced_count = fields.Integer(string='Invoiced Contracts', readonly=True)
+    skipped_count = fields.Integer(string='Skipped Contracts', readonly=True)
+    failed_count = fields.Integer(string='Failed Contracts', readonly=True)
+    invoice_count = fields.Integer(string='Invoices', readonly=True)
+    query_count = fields.Integer(string='Queries', readonly=True)
+
+    prepare_time = fields.Float(string='Prepare (s)', readonly=True, group_operator='avg')
+    prepare_queries = fields.Integer(string='Prepare Queries', readonly=True, group_operator='avg')
+    create_time = fields.Float(string='Create (s)', readonly=True, group_operator='avg')
+    create_queries = fields.Integer(string='Create Queries', readonly=True, group_operator='avg')
+    chatter_time = fields.Float(string='Chatter (s)', readonly=True, group_operator='avg')
+    chatter_queries = fields.Integer(string='Chatter Queries', readonly=True, group_operator='avg')
+    advance_time = fields.Float(string='Date Advance (s)', readonly=True, group_operator='avg')
+    advance_queries = fields.Integer(string='Date Advance Queries', readonly=True, group_operator='avg')
+
+    line_ids = fields.One2many('sale.contract.invoice.run.line', 'run_id', string='Contracts', readonly=True)
+
+    @api.model
+    @contextmanager
+    def _track(self, automatic):
+        """
+        Record the recurring run executed in the block, for automatic runs only. Yields the
+        :class:`InvoiceRunStats` of the run (None when the run is not recorded).
+        """
+        if not automatic:
+            yield None
+            return
+        auto_commit = self.env.context.get('auto_commit', True)
+        cr = self.env.cr
+        run = self.sudo().create({})
+        if auto_commit:
+            cr.commit()
+        stats = InvoiceRunStats(run)
+        count0 = cr.sql_log_count
+        try:
+            yield stats
+        except Exception as e:
+            if auto_commit:
+                # the transaction of the failing chunk is lost, but the previous ones are committed
+                cr.rollback()
+                run._finish(stats, cr.sql_log_count - count0, error=str(e))
+                cr.commit()
+            raise
+        run._finish(stats, cr.sql_log_count - count0)
+        if auto_commit:
+            cr.commit()
+        run._export_metrics()
+
+    def _finish(self, stats, query_count, error=False):
+        date_end = fields.Datetime.now()
+        self.write(dict(
+            stats._get_values(),
+            date_end=date_end,
+            duration=(date_end - self.date_start).total_seconds(),
+            query_count=query_count,
+            state='failed' if error else 'done',
+            error=error,
+        ))
+
+    def _get_prometheus_metrics(self):
+        """Return the metrics of the run in the Prometheus text exposition format."""
+        self.ensure_one()
+        labels = 'db="%s"' % self.env.cr.dbname
+        metrics = [
+            ('sale_contract_invoice_run_timestamp_seconds', 'End of the last recurring invoicing run.',
+             [('', self.date_end.timestamp())]),
+            ('sale_contract_invoice_run_duration_seconds', 'Duration of the last recurring invoicing run.',
+             [('', self.duration)]),
+            ('sale_contract_invoice_run_queries', 'SQL queries of the last recurring invoicing run.',
+             [('', self.query_count)]),
+            ('sale_contract_invoice_run_invoices', 'Invoices created by the last recurring invoicing run.',
+             [('', self.invoice_count)]),
+            ('sale_contract_invoice_run_contracts', 'Contracts processed by the last recurring invoicing run.',
+             [(',result="%s"' % result, self['%s_count' % result]) for result in ('invoiced', 'skipped', 'failed')]),
+            ('sale_contract_invoice_run_stage_seconds', 'Time spent per stage by the last recurring invoicing run.',
+             [(',stage="%s"' % stage, self['%s_time' % stage]) for stage in STAGES]),
+            ('sale_contract_invoice_run_stage_queries', 'SQL queries per stage of the last recurring invoicing run.',
+             [(',stage="%s"' % stage, self['%s_queries' % stage]) for stage in STAGES]),
+        ]
+        lines = []
+        for name, description, samples in metrics:
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s gauge' % name)
+            lines.extend('%s{%s%s} %s' % (name, labels, sample_labels, value) for sample_labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def _export_metrics(self):
+        """
+        Hook called at the end of each recorded run to publish its metrics. By default they are
+        written to the file given by the ``sale_contract.invoice_run_metrics_file`` system
+        parameter, to be collected by the textfile collector of the Prometheus node exporter.
+        """
+        path = self.env['ir.config_parameter'].sudo().get_param('sale_contract.invoice_run_metrics_file')
+        if not path:
+            return
+        try:
+            with open(path + '.tmp', 'w') as metrics_file:
+                metrics_file.write(self._get_prometheus_metrics())
+            os.replace(path + '.tmp', path)
+        except OSError:
+            _logger.exception('Fail to export the metrics of the recurring invoicing run to %s', path)
+
+    @api.autovacuum
+    def _gc_invoice_runs(self):
+        days = int(self.env['ir.config_parameter'].sudo().get_param('sale_contract.invoice_run_retention_days', 90))
+        limit_date = fields.Datetime.now() - timedelta(days=days)
+        self.search([('date_start', '<', limit_date), ('state', '!=', 'running')]).unlink()
+
+
+class SaleContractInvoiceRunLine(models.Model):
+    _name = "sale.contract.invoice.run.line"
+    _description = "Recurring Invoicing Run Result"
+
+    run_id = fields.Many2one('sale.contract.invoice.run', string='Run', required=True, index=True, ondelete='cascade')
+    contract_id = fields.Many2one('sale.contract', string='Contract', index=True, ondelete='cascade')
+    result = fields.Selection([
+        ('invoiced', 'Invoiced'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    ], required=True)
+    invoice_count = fields.Integer(string='Invoices')
+    message = fields.Text()
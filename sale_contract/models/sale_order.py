@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 import logging
+from collections import defaultdict
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
@@ -35,32 +36,78 @@ class SaleOrder(models.Model):
         :return: ids of modified contracts
         """
         res = []
+        orders_by_contract = {}
         for order in self:
             if order.contract_id and order.contract_id.update_contract_lines:
                 res.append(order.contract_id)
-            else:
-                continue
-
-            contract = order.contract_id
-            contract_lines = order.order_line
-
-            contract.write({'contract_line_ids': [(5, 0, 0)]})
-            contract.write({'contract_line_ids': [self._prepare_contract_line_data(line) for line in contract_lines]})
-
-            subcontract_count = self.env['sale.subcontract'].search_count([
-                ('contract_id', '=', contract.id),
-                ('sale_order_id', '=', order.id),
-            ])
-            if order.is_subcontract and subcontract_count == 0:
-                self.env['sale.subcontract'].create({
-                    'contract_id': contract.id,
-                    'sale_order_id': order.id,
-                    'subcontract_type': order.subcontract_type.id,
-                    'name': self.env['sale.subcontract'].search_count([('contract_id', '=', contract.id)]) + 1
-                })
+                # the lines of a contract follow the last of its orders
+                orders_by_contract[order.contract_id] = order
 
+        self._create_subcontracts(self.filtered(lambda o: o.contract_id in orders_by_contract))
+        self._sync_contract_lines(orders_by_contract)
         return res
 
+    def _create_subcontracts(self, orders):
+        """
+        Create the missing subcontracts of the subcontract orders, numbered per contract.
+        Existing subcontracts are fetched with one query for all orders and the numbers are
+        reserved on the contract counters with one update.
+        """
+        orders = orders.filtered('is_subcontract')
+        if not orders:
+            return self.env['sale.subcontract']
+        existing = {
+            (subcontract.contract_id.id, subcontract.sale_order_id.id)
+            for subcontract in self.env['sale.subcontract'].with_context(active_test=False).search([('sale_order_id', 'in', orders.ids)])
+        }
+        orders = orders.filtered(lambda o: (o.contract_id.id, o.id) not in existing)
+        counts = defaultdict(int)
+        for order in orders:
+            counts[order.contract_id.id] += 1
+        numbers = self.env['sale.contract']._reserve_subcontract_numbers(counts)
+        return self.env['sale.subcontract'].create([{
+            'contract_id': order.contract_id.id,
+            'sale_order_id': order.id,
+            'subcontract_type': order.subcontract_type.id,
+            'name': str(numbers[order.contract_id.id].pop(0)),
+        } for order in orders])
+
+    def _sync_contract_lines(self, orders_by_contract):
+        """
+        Make the lines of the contracts match the lines of their order. Contract lines are
+        paired with order lines through ``sale_line_id``: only changed fields are written,
+        missing lines are created and the remaining ones deleted, for all contracts at once.
+
+        :param orders_by_contract: dict {sale.contract: sale.order}
+        """
+        ContractLine = self.env['sale.contract.line']
+        to_create = []
+        to_unlink = ContractLine
+        for contract, order in orders_by_contract.items():
+            contract_lines = {}
+            for contract_line in contract.contract_line_ids:
+                if contract_line.sale_line_id and contract_line.sale_line_id.id not in contract_lines:
+                    contract_lines[contract_line.sale_line_id.id] = contract_line
+                else:
+                    to_unlink |= contract_line
+
+            for order_line in order.order_line:
+                values = dict(order._prepare_contract_line_data(order_line)[2], sale_line_id=order_line.id)
+                contract_line = contract_lines.pop(order_line.id, None)
+                if contract_line is None:
+                    values['contract_id'] = contract.id
+                    to_create.append(values)
+                    continue
+                changed_values = contract_line._get_changed_values(values)
+                if changed_values:
+                    contract_line.write(changed_values)
+
+            for contract_line in contract_lines.values():
+                to_unlink |= contract_line
+
+        to_unlink.unlink()
+        ContractLine.create(to_create)
+
     def _action_confirm(self):
         """Update and/or create subscriptions on order confirmation."""
         res = super(SaleOrder, self)._action_confirm()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo import fields, models, tools
+
+# number of months in a period of each recurrence
+MONTHS_PER_PERIOD = {
+    'daily': 12 / 365.25,
+    'weekly': 7 * 12 / 365.25,
+    'monthly': 1.0,
+    'yearly': 12.0,
+}
+
+
+class SaleContractReport(models.Model):
+    _name = "sale.contract.report"
+    _description = "Recurring Revenue Analysis"
+    _auto = False
+    _rec_name = 'contract_id'
+    _order = 'mrr desc'
+
+    contract_id = fields.Many2one('sale.contract', string='Contract', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Customer', readonly=True)
+    commercial_partner_id = fields.Many2one('res.partner', string='Customer Entity', readonly=True)
+    country_id = fields.Many2one('res.country', string='Customer Country', readonly=True)
+    user_id = fields.Many2one('res.users', string='Salesperson', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('confirmed', 'Confirmed'),
+        ('done', 'Done'),
+        ('cancel', 'Cancelled'),
+    ], string='Status', readonly=True)
+    recurring_rule_type = fields.Selection([
+        ('daily', 'Days'),
+        ('weekly', 'Weeks'),
+        ('monthly', 'Months'),
+        ('yearly', 'Years'),
+    ], string='Recurrence', readonly=True)
+    recurring_interval = fields.Integer(string='Invoicing Period', readonly=True, group_operator=False)
+    date_start = fields.Date(string='Start Date', readonly=True)
+    date_end = fields.Date(string='End Date', readonly=True)
+    nbr = fields.Integer(string='# of Contracts', readonly=True)
+    amount_untaxed = fields.Float(string='Untaxed Amount per Period', readonly=True, digits='Account')
+    mrr = fields.Float(string='Monthly Recurring Revenue', readonly=True, digits='Account')
+    arr = fields.Float(string='Annual Recurring Revenue', readonly=True, digits='Account')
+
+    def _select(self):
+        months = ' '.join(
+            "WHEN '%s' THEN %s" % (rule_type, factor) for rule_type, factor in MONTHS_PER_PERIOD.items()
+        )
+        period_months = "(CASE c.recurring_rule_type %s END) * c.recurring_interval" % months
+        return """
+            c.id AS id,
+            c.id AS contract_id,
+            c.partner_id,
+            p.commercial_partner_id,
+            c.country_id,
+            c.user_id,
+            c.company_id,
+            pl.currency_id,
+            c.state,
+            c.recurring_rule_type,
+            c.recurring_interval,
+            c.date_start,
+            c.date_end,
+            1 AS nbr,
+            c.contract_total - c.contract_tax_total AS amount_untaxed,
+            (c.contract_total - c.contract_tax_total) / %(period_months)s AS mrr,
+            (c.contract_total - c.contract_tax_total) * 12 / %(period_months)s AS arr
+        """ % {'period_months': period_months}
+
+    def _from(self):
+        return """
+            sale_contract c
+            JOIN res_partner p ON p.id = c.partner_id
+            JOIN product_pricelist pl ON pl.id = c.pricelist_id
+        """
+
+    def _where(self):
+        return """
+            c.active
+            AND c.is_recurring
+            AND c.recurring_interval > 0
+        """
+
+    def init(self):
+        # one row per contract, read straight from the stored totals: the pivot and graph views
+        # aggregate the contracts without going through their lines
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""CREATE OR REPLACE VIEW %s AS (SELECT %s FROM %s WHERE %s)""" % (
+            self._table, self._select(), self._from(), self._where()))
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from . import test_query_count
+from . import test_performance
+from . import test_invoice_run
+from . import test_upsert
+from . import test_reprice
+from . import test_receivable_balance
+from . import test_report
+from . import test_archive
+from . import test_schedule
+from . import test_sale_order
+from . import test_amount_words
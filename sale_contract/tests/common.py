@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo import fields
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class SaleContractCommon(AccountTestInvoicingCommon):
+    """Contracts, orders and partners datasets for the sale contract tests."""
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        # bulk data does not need chatter
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True, mail_create_nolog=True))
+        cls.tax = cls.company_data['default_tax_sale']
+        cls.products = cls.product_a + cls.product_b
+        cls.pricelist = cls.env['product.pricelist'].create({
+            'name': 'Contracts',
+            'currency_id': cls.company_data['currency'].id,
+            'company_id': cls.company_data['company'].id,
+        })
+
+    def _count_queries(self, func, records):
+        """Return the number of queries of ``func(records)``, from an empty cache of ``records``."""
+        self.env['base'].flush()
+        records.invalidate_cache()
+        count0 = self.cr.sql_log_count
+        func(records)
+        return self.cr.sql_log_count - count0
+
+    def assertConstantQueries(self, func, small, large):
+        """Check ``func`` runs as many queries on ``small`` as on ``large``, once caches are warm."""
+        self._count_queries(func, small)
+        small_count = self._count_queries(func, small)
+        large_count = self._count_queries(func, large)
+        self.assertEqual(
+            small_count, large_count,
+            "%d queries for %d records, %d for %d records" % (small_count, len(small), large_count, len(large)))
+
+    @classmethod
+    def _create_partner_tree(cls, depth, width):
+        """Create a company with ``width`` children per partner on ``depth`` levels, return all partners."""
+        Partner = cls.env['res.partner']
+        partners = level = Partner.create({'name': 'Contract Holding', 'is_company': True})
+        for depth_index in range(depth):
+            level = Partner.create([
+                {'name': 'Contact %s-%s' % (depth_index, index), 'parent_id': parent.id}
+                for parent in level for index in range(width)
+            ])
+            partners |= level
+        return partners
+
+    @classmethod
+    def _create_contracts(cls, count, partners, lines_per_contract=2, **values):
+        """Create ``count`` recurring contracts due today, spread over ``partners``."""
+        today = fields.Date.today()
+        return cls.env['sale.contract'].create([dict({
+            'name': 'PERF/%05d' % index,
+            'partner_id': partners[index % len(partners)].id,
+            'pricelist_id': cls.pricelist.id,
+            'company_id': cls.company_data['company'].id,
+            'is_recurring': True,
+            'state': 'confirmed',
+            'recurring_next_date': today,
+            'recurring_invoice_day': today.day,
+            'contract_line_ids': [(0, 0, {
+                'product_id': cls.products[line_index % 2].id,
+                'name': cls.products[line_index % 2].name,
+                'uom_id': cls.products[line_index % 2].uom_id.id,
+                'quantity': 1.0 + line_index,
+                'price_unit': 100.0 * (line_index + 1),
+                'tax_id': [(6, 0, cls.tax.ids)],
+            }) for line_index in range(lines_per_contract)],
+        }, **values) for index in range(count)])
+
+    @classmethod
+    def _create_orders(cls, contracts, lines_per_order=2):
+        """Create a quotation for every contract."""
+        return cls.env['sale.order'].create([{
+            'partner_id': contract.partner_id.id,
+            'contract_id': contract.id,
+            'pricelist_id': cls.pricelist.id,
+            'order_line': [(0, 0, {
+                'product_id': cls.products[line_index % 2].id,
+                'product_uom_qty': 1.0 + line_index,
+                'price_unit': 100.0 * (line_index + 1),
+                'tax_id': [(6, 0, cls.tax.ids)],
+            }) for line_index in range(lines_per_order)],
+        } for contract in contracts])
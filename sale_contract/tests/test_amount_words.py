@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+import unittest
+
+from odoo.tests import SavepointCase, tagged
+
+try:
+    from num2words.lang_RU import Num2Word_RU
+except ImportError:
+    Num2Word_RU = None
+
+
+@tagged('post_install', '-at_install')
+@unittest.skipIf(Num2Word_RU is None, "num2words is not installed")
+class TestAmountWords(SavepointCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.uzs = cls.env.ref('base.UZS')
+        cls.uzs_ru = cls.env.ref('sale_contract.currency_words_uzs_ru')
+
+    def _to_words(self, amount):
+        return self.env['amount.words'].amount_to_words(amount, self.uzs, 'ru_RU')
+
+    def test_currency_forms(self):
+        # the forms of res.currency.words are used, not those num2words may know
+        self.assertIn('сума', self._to_words(2.0))
+        self.assertNotIn('сумов', self._to_words(2.0))
+        words = self._to_words(1005.21)
+        self.assertIn('сумов', words)
+        self.assertTrue(words.endswith('двадцать один тиин'), words)
+
+    def test_forms_update_clears_cache(self):
+        self.assertIn('сумов', self._to_words(5.0))
+        self.uzs_ru.unit_many = 'сўмов'
+        self.assertIn('сўмов', self._to_words(5.0))
+        self.uzs_ru.unlink()
+        self.assertNotIn('сўмов', self._to_words(5.0))
+
+    def test_num2words_untouched(self):
+        forms = dict(Num2Word_RU.CURRENCY_FORMS)
+        self.uzs_ru.unit_many = 'сўмов'
+        self.assertIn('сўмов', self._to_words(5.0))
+        # the forms are set on a private converter
+        self.assertEqual(Num2Word_RU.CURRENCY_FORMS, forms)
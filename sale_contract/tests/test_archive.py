@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractArchive(SaleContractCommon):
+
+    def test_cron_archive_contracts(self):
+        today = fields.Date.today()
+        ended = self._create_contracts(3, self.partner_a, date_end=today - relativedelta(days=100))
+        recent = self._create_contracts(1, self.partner_a, date_end=today - relativedelta(days=10))
+        live = self._create_contracts(1, self.partner_a)
+        self.env['sale.subcontract'].create({'contract_id': ended[0].id, 'name': '1'})
+        self.env['ir.config_parameter'].sudo().set_param('sale_contract.archive_batch_size', 2)
+
+        self.env['sale.contract'].with_context(auto_commit=False)._cron_archive_contracts()
+
+        self.assertEqual(ended.mapped('active'), [False] * 3)
+        self.assertEqual(ended.mapped('date_archived'), [today] * 3)
+        self.assertTrue(recent.active)
+        self.assertTrue(live.active)
+        # lines and subcontracts are archived with their contract, and still read through it
+        self.assertTrue(ended.contract_line_ids)
+        self.assertFalse(any(ended.contract_line_ids.mapped('active')))
+        self.assertFalse(ended[0].subcontract_ids.active)
+        all_contracts = ended | recent | live
+        self.assertEqual(self.env['sale.contract'].search([('id', 'in', all_contracts.ids)]), recent | live)
+        self.assertEqual(
+            self.env['sale.contract'].search([('id', 'in', all_contracts.ids), ('active', '=', False)]), ended)
+
+        ended[0].action_unarchive()
+        self.assertFalse(ended[0].date_archived)
+        self.assertTrue(ended[0].contract_line_ids.active)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractInvoiceRun(SaleContractCommon):
+
+    def test_cron_records_run(self):
+        contracts = self._create_contracts(5, self.partner_a)
+        self.env['sale.contract'].with_context(auto_commit=False)._cron_recurring_create_invoice()
+
+        run = self.env['sale.contract.invoice.run'].search([], limit=1)
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.invoiced_count, 5)
+        self.assertEqual(run.invoice_count, 5)
+        self.assertEqual(run.contract_count, len(run.line_ids))
+        self.assertEqual(run.line_ids.contract_id, contracts)
+        self.assertEqual(set(run.line_ids.mapped('result')), {'invoiced'})
+        self.assertGreater(run.query_count, 0)
+        self.assertIn('sale_contract_invoice_run_invoices{db=', run._get_prometheus_metrics())
+
+    def test_deferred_notes(self):
+        contracts = self._create_contracts(3, self.partner_a)
+        invoices = contracts.with_context(recurring_invoice_deferred_notes=True)._recurring_create_invoice()
+
+        self.assertEqual(len(invoices), 3)
+        note = self.env.ref('mail.mt_note')
+        for invoice in invoices:
+            message = invoice.message_ids.filtered(lambda m: m.subtype_id == note and m.message_type == 'comment')
+            self.assertEqual(len(message), 1)
+            self.assertIn('data-oe-id="%s"' % invoice.contract_id.id, message.body)
+            self.assertIn(invoice.contract_id.name, message.body)
+
+    def test_preview(self):
+        contracts = self._create_contracts(3, self.partner_a)
+        Invoice = self.env['account.move']
+        invoice_count = Invoice.search_count([])
+
+        wizard = self.env['sale.contract.invoice.preview'].create({'contract_ids': [(6, 0, contracts.ids)]})
+        wizard.action_preview()
+        self.assertEqual(Invoice.search_count([]), invoice_count, "a preview creates no invoice")
+        self.assertEqual(wizard.invoice_count, 3)
+        self.assertEqual(wizard.line_ids.contract_id, contracts)
+        self.assertEqual(set(wizard.line_ids.mapped('invoice_date')), set(contracts.mapped('recurring_next_date')))
+
+        invoices = contracts._recurring_create_invoice()
+        for line in wizard.line_ids:
+            invoice = invoices.filtered(lambda i: i.contract_id == line.contract_id)
+            self.assertAlmostEqual(line.amount_untaxed, invoice.amount_untaxed)
+            self.assertAlmostEqual(line.amount_total, invoice.amount_total)
+
+        action = wizard.action_export_csv()
+        self.assertIn(str(wizard.attachment_id.id), action['url'])
+        csv_lines = wizard.attachment_id.raw.decode().splitlines()
+        self.assertEqual(len(csv_lines), 4)
+
+    def test_preview_multi_company(self):
+        company_2 = self.company_data_2['company']
+        tax_2 = self.company_data_2['default_tax_sale']
+        self.products.write({'taxes_id': [(4, tax_2.id)]})
+        pricelist_2 = self.env['product.pricelist'].create({
+            'name': 'Contracts',
+            'currency_id': self.company_data_2['currency'].id,
+            'company_id': company_2.id,
+        })
+        contracts = self._create_contracts(2, self.partner_a)
+        contracts_2 = self._create_contracts(2, self.partner_a, company_id=company_2.id, pricelist_id=pricelist_2.id)
+
+        # the preview is started from the first company, like the wizard
+        rows = list(self.env['sale.contract']._preview_recurring_invoices(contract_ids=(contracts + contracts_2).ids))
+        self.assertEqual(len(rows), 4)
+        invoices = (contracts + contracts_2)._recurring_create_invoice()
+        for row in rows:
+            invoice = invoices.filtered(lambda i: i.contract_id.id == row['contract_id'])
+            self.assertEqual(row['company_id'], invoice.company_id.id)
+            self.assertEqual(row['journal_id'], invoice.journal_id.id)
+            self.assertAlmostEqual(row['amount_tax'], invoice.amount_tax)
+        rows_2 = [row for row in rows if row['contract_id'] in contracts_2.ids]
+        self.assertEqual({row['journal_id'] for row in rows_2}, set(self.company_data_2['default_journal_sale'].ids))
+        self.assertTrue(all(row['amount_tax'] for row in rows_2), "the taxes of the second company apply")
+
+    def test_preview_threads(self):
+        contracts = self._create_contracts(4, self.partner_a)
+        self.env['ir.config_parameter'].sudo().set_param('sale_contract.recurring_invoice_batch_size', 2)
+        Contract = self.env['sale.contract']
+        inline = list(Contract._preview_recurring_invoices(contract_ids=contracts.ids, workers=1))
+
+        # the cursors of the workers share the test transaction, and wait for each other
+        isolated = type(Contract)._get_recurring_invoice_preview_isolated
+        with patch.object(type(self.registry), 'in_test_mode', return_value=False), \
+                patch.object(type(Contract), '_get_recurring_invoice_preview_isolated',
+                             autospec=True, side_effect=isolated) as preview:
+            threaded = list(Contract._preview_recurring_invoices(contract_ids=contracts.ids, workers=2))
+
+        self.assertEqual(preview.call_count, 2)
+        self.assertEqual(len(threaded), 4)
+        self.assertEqual(threaded, inline)
+        self.assertFalse(self.env['account.move'].search([('contract_id', 'in', contracts.ids)]))
+
+    def test_deferred_notes_failure_is_isolated(self):
+        contracts = self._create_contracts(3, self.partner_a)
+        faulty = contracts[1]
+        Contract = self.env['sale.contract']
+        post_notes = type(Contract)._post_recurring_invoice_notes
+
+        def _post_recurring_invoice_notes(self, invoices):
+            if faulty in invoices.contract_id:
+                raise ValueError("cannot log the note")
+            return post_notes(self, invoices)
+
+        with patch.object(type(Contract), '_post_recurring_invoice_notes', _post_recurring_invoice_notes):
+            invoices = contracts.with_context(recurring_invoice_deferred_notes=True, auto_commit=False)\
+                ._recurring_create_invoice(automatic=True)
+
+        self.assertEqual(invoices.contract_id, contracts - faulty)
+        run = self.env['sale.contract.invoice.run'].search([], limit=1)
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.line_ids.filtered(lambda l: l.result == 'failed').contract_id, faulty)
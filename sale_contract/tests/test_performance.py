@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from odoo.tests import tagged
+from odoo.tools import str2bool
+
+from .common import SaleContractCommon
+
+_logger = logging.getLogger(__name__)
+
+# number of contracts of the dataset: 1000, 10000, 100000...
+PERF_SIZE = int(os.environ.get('SALE_CONTRACT_PERF_SIZE', 1000))
+
+# budgets of the hot paths, as measured by the last recording: run the suite with
+# SALE_CONTRACT_PERF_RECORD=1 to write the queries and seconds of every path in BUDGETS_FILE,
+# and commit it. The paths whose cost depends on the number of records are scaled to the size
+# of the dataset. A path fails when it runs more than QUERY_MARGIN more queries than recorded;
+# the time only guards against a gross regression, it depends on the machine.
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'perf_budgets.json')
+RECORD = str2bool(os.environ.get('SALE_CONTRACT_PERF_RECORD', '0'))
+QUERY_MARGIN = 0.1
+TIME_FACTOR = 5.0
+SCALED_PATHS = {'recurring_create_invoice', 'confirm_orders'}
+
+
+def _load_budgets():
+    if not os.path.exists(BUDGETS_FILE):
+        return {}
+    with open(BUDGETS_FILE) as budgets_file:
+        return json.load(budgets_file)
+
+
+def _record_budget(name, queries, seconds, size):
+    budgets = _load_budgets()
+    budgets[name] = {'queries': queries, 'seconds': round(seconds, 3), 'size': size}
+    with open(BUDGETS_FILE, 'w') as budgets_file:
+        json.dump(budgets, budgets_file, indent=4, sort_keys=True)
+        budgets_file.write('\n')
+
+
+@tagged('-standard', 'sale_contract_perf')
+class TestSaleContractPerformance(SaleContractCommon):
+    """
+    Query and time budgets of the hot paths on a large synthetic dataset. Run them with
+    ``--test-tags sale_contract_perf``, the size of the dataset is given by the
+    ``SALE_CONTRACT_PERF_SIZE`` environment variable.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.partners = cls._create_partner_tree(depth=6, width=3)
+        cls.contracts = cls._create_contracts(PERF_SIZE, cls.partners, lines_per_contract=3)
+
+    @contextmanager
+    def assertPathBudget(self, name, count=None):
+        """
+        Fail when the block runs more queries than recorded for the path ``name``, with a margin
+        of QUERY_MARGIN, or takes more than TIME_FACTOR times the recorded time. The queries
+        and time of the paths listed in SCALED_PATHS are scaled to ``count`` records.
+        """
+        self.env['base'].flush()
+        count0 = self.cr.sql_log_count
+        time0 = time.perf_counter()
+        yield
+        self.env['base'].flush()
+        duration = time.perf_counter() - time0
+        queries = self.cr.sql_log_count - count0
+        size = count if name in SCALED_PATHS else 1
+        _logger.info("%s: %d queries, %.2fs", name, queries, duration)
+        if RECORD:
+            _record_budget(name, queries, duration, size)
+            return
+        budget = _load_budgets().get(name)
+        if not budget:
+            _logger.warning("%s: no recorded budget, run the suite with SALE_CONTRACT_PERF_RECORD=1", name)
+            return
+        ratio = size / budget['size']
+        max_queries = int(budget['queries'] * ratio * (1 + QUERY_MARGIN)) + 1
+        max_seconds = budget['seconds'] * ratio * TIME_FACTOR + 1.0
+        self.assertLessEqual(queries, max_queries, "%s: %d queries, %d recorded for %d records" % (
+            name, queries, budget['queries'], budget['size']))
+        self.assertLessEqual(duration, max_seconds, "%s: %.2fs, %.2fs recorded for %d records" % (
+            name, duration, budget['seconds'], budget['size']))
+
+    def assertLinear(self, func, records, sample_size=20):
+        """
+        Run ``func`` on a sample of ``records`` then on the others, and fail when a record of the
+        large part costs more queries than a record of the sample, which carries the fixed costs.
+        :returns: number of queries of the large part
+        """
+        sample, others = records[:sample_size], records[sample_size:]
+        self.env['base'].flush()
+        count0 = self.cr.sql_log_count
+        func(sample)
+        self.env['base'].flush()
+        sample_count = self.cr.sql_log_count - count0
+        count0 = self.cr.sql_log_count
+        func(others)
+        self.env['base'].flush()
+        count = self.cr.sql_log_count - count0
+        self.assertLessEqual(
+            count / len(others), sample_count / len(sample),
+            "%d queries for %d records, %d for %d records" % (sample_count, len(sample), count, len(others)))
+        return count
+
+    def test_recurring_create_invoice(self):
+        # the bulk invoicing logs its notes in batch
+        contracts = self.contracts.with_context(recurring_invoice_deferred_notes=True)
+        with self.assertPathBudget('recurring_create_invoice', len(contracts)):
+            invoices = contracts._recurring_create_invoice()
+        self.assertEqual(len(invoices), len(contracts))
+
+    def test_recurring_create_invoice_linear(self):
+        contracts = self.contracts.with_context(recurring_invoice_deferred_notes=True)
+        self.assertLinear(lambda contracts: contracts._recurring_create_invoice(), contracts)
+
+    def test_confirm_orders(self):
+        orders = self._create_orders(self.contracts)
+        with self.assertPathBudget('confirm_orders', len(orders)):
+            orders.action_confirm()
+        self.assertEqual(len(self.contracts.contract_line_ids), 2 * len(self.contracts))
+
+    def test_confirm_orders_linear(self):
+        orders = self._create_orders(self.contracts)
+        self.assertLinear(lambda orders: orders.action_confirm(), orders)
+
+    def test_partner_contract_count(self):
+        self.partners[:1].mapped('contract_count')
+        self.partners.invalidate_cache()
+        with self.assertPathBudget('partner_contract_count'):
+            self.partners.mapped('contract_count')
+        self.assertEqual(self.partners[0].contract_count, len(self.contracts))
+
+    def test_name_get(self):
+        self.contracts.invalidate_cache()
+        with self.assertPathBudget('name_get'):
+            self.contracts.name_get()
+
+    def test_name_search(self):
+        # autocompletion of the contract fields: the number, partner name and external id are
+        # matched through the trigram indexes when pg_trgm is installed
+        self.env['sale.contract'].name_search('PERF/00')
+        with self.assertPathBudget('name_search'):
+            result = self.env['sale.contract'].name_search('PERF/0001', limit=8)
+        self.assertTrue(result)
+
+    def test_name_search_index(self):
+        # the queries of the autocompletion are answered from the indexes, even for a term
+        # matching many partners
+        self.env.cr.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if not self.env.cr.fetchone():
+            self.skipTest("pg_trgm is not installed")
+        Contract = self.env['sale.contract']
+        Contract.flush()
+        self.env.cr.execute("ANALYZE sale_contract")
+        self.env.cr.execute("ANALYZE res_partner")
+        execute = type(self.env.cr).execute
+        with patch.object(type(self.env.cr), 'execute', autospec=True, side_effect=execute) as spy:
+            Contract._name_search('Cont', limit=8)
+        queries = [
+            (call[0][1], call[0][2] if len(call[0]) > 2 else None)
+            for call in spy.call_args_list
+            if 'sale_contract' in call[0][1] and 'ilike' in call[0][1].lower()
+        ]
+        self.assertEqual(len(queries), 2, "the number and the partner are looked up separately")
+        plans = []
+        # the datasets are small: only the availability of the indexes is checked
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+        try:
+            for query_str, params in queries:
+                self.env.cr.execute("EXPLAIN " + query_str, params)
+                plans.append("\n".join(row[0] for row in self.env.cr.fetchall()))
+        finally:
+            self.env.cr.execute("SET LOCAL enable_seqscan = on")
+        _logger.info("name_search plans:\n%s", "\n\n".join(plans))
+        self.assertIn('sale_contract_name_trgm_index', plans[0])
+        self.assertIn('sale_contract_external_id_trgm_index', plans[0])
+        for plan in plans:
+            self.assertNotIn('Seq Scan on sale_contract', plan)
+            self.assertNotIn('Seq Scan on res_partner', plan)
+
+    def test_contract_counts(self):
+        self.contracts.invalidate_cache()
+        with self.assertPathBudget('contract_counts'):
+            for fname in ('invoice_count', 'sale_order_count'):
+                self.env.add_to_compute(self.contracts._fields[fname], self.contracts)
+            self.contracts.recompute(['invoice_count', 'sale_order_count'])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractQueryCount(SaleContractCommon):
+    """The cost of the hot paths must not depend on the number of records they are called on."""
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.partners = cls._create_partner_tree(depth=4, width=2)
+        cls.contracts = cls._create_contracts(40, cls.partners)
+        cls.orders = cls._create_orders(cls.contracts[:20])
+
+    def test_partner_contract_count(self):
+        compute = lambda partners: partners.mapped('contract_count')
+        self.assertConstantQueries(compute, self.partners[:1], self.partners)
+        self.partners.invalidate_cache()
+        with self.assertQueryCount(1):
+            compute(self.partners)
+
+        root = self.partners[0]
+        self.assertEqual(root.contract_count, len(self.contracts))
+        leaf = self.partners[-1]
+        self.assertEqual(leaf.contract_count, len(self.contracts.filtered(lambda c: c.partner_id == leaf)))
+
+    def test_contract_counts(self):
+        def compute(contracts):
+            for fname in ('invoice_count', 'sale_order_count'):
+                self.env.add_to_compute(contracts._fields[fname], contracts)
+            contracts.recompute(['invoice_count', 'sale_order_count'])
+
+        self.assertConstantQueries(compute, self.contracts[:2], self.contracts)
+        self.assertEqual(self.contracts[:20].mapped('sale_order_count'), [1] * 20)
+        self.assertEqual(self.contracts[20:].mapped('sale_order_count'), [0] * 20)
+
+    def test_name_get(self):
+        name_get = lambda contracts: contracts.name_get()
+        self.assertConstantQueries(name_get, self.contracts[:2], self.contracts)
+        self.contracts.invalidate_cache()
+        with self.assertQueryCount(1):
+            name_get(self.contracts)
+
+    def test_create_subcontracts(self):
+        contracts = self.contracts[:2]
+        self.env['sale.subcontract'].create({'contract_id': contracts[0].id, 'name': 'legacy'})
+        orders = self._create_orders(contracts + contracts + contracts[:1])
+        orders.write({'is_subcontract': True})
+
+        subcontracts = orders._create_subcontracts(orders)
+        self.assertEqual(subcontracts.sale_order_id, orders)
+        # numbering resumes after the subcontracts created before the counter existed
+        self.assertEqual(sorted(subcontracts.filtered(lambda s: s.contract_id == contracts[0]).mapped('name')), ['2', '3', '4'])
+        self.assertEqual(sorted(subcontracts.filtered(lambda s: s.contract_id == contracts[1]).mapped('name')), ['1', '2'])
+        self.assertEqual(contracts.mapped('subcontract_sequence'), [4, 2])
+        # orders which already have their subcontract are skipped
+        self.assertFalse(orders._create_subcontracts(orders))
+
+    def test_name_search(self):
+        contract = self.contracts[3]
+        contract.external_id = 'EXT-NAME-SEARCH'
+        Contract = self.env['sale.contract']
+        self.assertIn(contract.id, [id_ for id_, __ in Contract.name_search(contract.name)])
+        self.assertIn(contract.id, [id_ for id_, __ in Contract.name_search('№%s' % contract.name)])
+        self.assertEqual([id_ for id_, __ in Contract.name_search('EXT-NAME')], [contract.id])
+        partner_matches = [id_ for id_, __ in Contract.name_search(contract.partner_id.name, limit=None)]
+        self.assertIn(contract.id, partner_matches)
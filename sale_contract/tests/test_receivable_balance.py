@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractReceivableBalance(SaleContractCommon):
+
+    def assertBalance(self, contract, invoiced, paid, residual, overdue):
+        self.assertRecordValues(contract, [{
+            'amount_invoiced': invoiced,
+            'amount_paid': paid,
+            'amount_residual': residual,
+            'amount_overdue': overdue,
+        }])
+
+    def test_receivable_balance(self):
+        contract = self._create_contracts(1, self.partner_a)
+        invoice = contract._recurring_create_invoice()
+        # draft invoices are not receivable yet
+        self.assertEqual(invoice.state, 'draft')
+        self.assertBalance(contract, 0.0, 0.0, 0.0, 0.0)
+        invoice.action_post()
+        total = invoice.amount_total
+        self.assertBalance(contract, total, 0.0, total, 0.0)
+
+        self.env['account.payment.register'].with_context(active_model='account.move', active_ids=invoice.ids).create({
+            'amount': 100.0,
+        })._create_payments()
+        self.assertBalance(contract, total, 100.0, total - 100.0, 0.0)
+
+        # the balance becomes overdue once the due date is passed
+        invoice.line_ids.filtered('date_maturity').write({'date_maturity': fields.Date.today() - relativedelta(days=1)})
+        self.env['sale.contract']._cron_refresh_receivable_balance()
+        self.assertBalance(contract, total, 100.0, total - 100.0, total - 100.0)
+
+        # the credit note of the invoice counts in the contract balance
+        invoice.line_ids.remove_move_reconcile()
+        invoice._reverse_moves(cancel=True)
+        self.assertBalance(contract, 0.0, 0.0, 0.0, 0.0)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractReport(SaleContractCommon):
+
+    def test_recurring_revenue(self):
+        monthly = self._create_contracts(2, self.partner_a)
+        quarterly = self._create_contracts(1, self.partner_a, recurring_interval=3)
+        yearly = self._create_contracts(1, self.partner_a, recurring_rule_type='yearly')
+        contracts = monthly | quarterly | yearly
+        self.env['base'].flush()
+
+        Report = self.env['sale.contract.report']
+        for contract, months in [(monthly[0], 1), (quarterly, 3), (yearly, 12)]:
+            untaxed = contract.contract_total - contract.contract_tax_total
+            row = Report.search([('contract_id', '=', contract.id)])
+            self.assertAlmostEqual(row.mrr, untaxed / months, places=2)
+            self.assertAlmostEqual(row.arr, untaxed * 12 / months, places=2)
+
+        groups = Report.read_group([('contract_id', 'in', contracts.ids)], ['mrr', 'nbr'], ['currency_id'])
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]['nbr'], 4)
+        self.assertAlmostEqual(groups[0]['mrr'], sum(Report.search([('contract_id', 'in', contracts.ids)]).mapped('mrr')), places=2)
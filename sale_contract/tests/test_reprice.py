@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractReprice(SaleContractCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.contracts = cls._create_contracts(10, cls.partner_a)
+        cls.env['product.pricelist.item'].create({
+            'pricelist_id': cls.pricelist.id,
+            'applied_on': '3_global',
+            'compute_price': 'percentage',
+            'percent_price': 10.0,
+        })
+
+    def test_reprice(self):
+        lines = self.contracts.contract_line_ids
+        expected = {line: line.product_id.lst_price * 0.9 for line in lines}
+
+        wizard = self.env['sale.contract.reprice'].with_context(
+            active_model='sale.contract', active_ids=self.contracts.ids).create({})
+        wizard.action_preview()
+        self.assertEqual(wizard.state, 'preview')
+        self.assertEqual(wizard.line_ids.contract_line_id, lines)
+        for change in wizard.line_ids:
+            self.assertAlmostEqual(change.price_unit, expected[change.contract_line_id])
+        # a preview does not change the contracts
+        self.assertNotEqual(lines.mapped('price_unit'), [expected[line] for line in lines])
+
+        wizard.action_apply()
+        self.assertEqual(wizard.state, 'done')
+        for line in lines:
+            self.assertAlmostEqual(line.price_unit, expected[line])
+        self.assertFalse(lines._reprice(dry_run=True))
+
+    def test_reprice_query_count(self):
+        reprice = lambda lines: lines._reprice(dry_run=True)
+        self.assertConstantQueries(reprice, self.contracts[:2].contract_line_ids, self.contracts.contract_line_ids)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleOrderContractLines(SaleContractCommon):
+
+    def test_sync_contract_lines(self):
+        contract = self._create_contracts(1, self.partner_a)
+        order = self._create_orders(contract, lines_per_order=3)
+        order.action_confirm()
+        # the lines of the contract are replaced by those of the order
+        self.assertEqual(contract.contract_line_ids.sale_line_id, order.order_line)
+        contract_lines = {line.sale_line_id: line for line in contract.contract_line_ids}
+        kept, changed, removed = order.order_line
+
+        order.action_cancel()
+        order.action_draft()
+        order.write({'order_line': [
+            (1, changed.id, {'price_unit': 250.0, 'discount': 10.0}),
+            (2, removed.id),
+        ]})
+        ContractLine = self.env['sale.contract.line']
+        write = type(ContractLine).write
+        with patch.object(type(ContractLine), 'write', autospec=True, side_effect=write) as spy:
+            order.action_confirm()
+
+        written = ContractLine.union(*(call[0][0] for call in spy.call_args_list))
+        self.assertEqual(contract.contract_line_ids, contract_lines[kept] + contract_lines[changed])
+        # unchanged lines are kept as they are
+        self.assertNotIn(contract_lines[kept], written)
+        self.assertEqual(contract_lines[kept].price_unit, 100.0)
+        # only the changed fields are written
+        self.assertEqual(written, contract_lines[changed])
+        self.assertEqual(set(spy.call_args_list[0][0][1]), {'price_unit', 'discount'})
+        self.assertEqual(contract_lines[changed].price_unit, 250.0)
+        self.assertEqual(contract_lines[changed].discount, 10.0)
+        # lines removed from the order are removed from the contract
+        self.assertFalse(contract_lines[removed].exists())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from unittest.mock import patch
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import fields
+from odoo.exceptions import ValidationError
+from odoo.tests import tagged
+from odoo.tools import format_date
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractSchedule(SaleContractCommon):
+
+    def test_forecast_schedule(self):
+        today = fields.Date.today()
+        confirmed = self._create_contracts(1, self.partner_a)
+        draft = self._create_contracts(1, self.partner_a, state='draft')
+        cancelled = self._create_contracts(1, self.partner_a, state='cancel')
+        stuck = self._create_contracts(1, self.partner_a)
+        # a recurrence that never moves forward, as stored by data written before the constraint
+        self.env['base'].flush()
+        self.env.cr.execute("UPDATE sale_contract SET recurring_interval = 0 WHERE id = %s", [stuck.id])
+        stuck.invalidate_cache(['recurring_interval'])
+
+        contracts = confirmed | draft | cancelled | stuck
+        rows = contracts.forecast_schedule(today, today + relativedelta(months=2, days=-1))
+        self.assertEqual({row['contract_id'] for row in rows}, set(confirmed.ids))
+        self.assertEqual(len(rows), 2)
+
+    def test_recurring_interval(self):
+        contract = self._create_contracts(1, self.partner_a)
+        with self.assertRaises(ValidationError), self.cr.savepoint():
+            contract.recurring_interval = 0
+
+        # catching up on a recurrence that does not move forward invoices its period once
+        self.env.cr.execute("UPDATE sale_contract SET recurring_interval = 0 WHERE id = %s", [contract.id])
+        contract.invalidate_cache(['recurring_interval'])
+        today = fields.Date.today()
+        contract.recurring_next_date = today - relativedelta(months=3)
+        self.assertEqual(contract._get_recurring_invoice_dates(today, 120), [contract.recurring_next_date])
+
+    def test_catch_up(self):
+        today = fields.Date.today()
+        start = today.replace(day=1) - relativedelta(months=4)
+        # four periods are due before the end date, a fifth one would start after it
+        contract = self._create_contracts(
+            1, self.partner_a, recurring_next_date=start, recurring_invoice_day=1,
+            recurring_rule_type='monthly', recurring_interval=1, date_end=start + relativedelta(months=3, days=10))
+
+        write = type(contract).write
+        with patch.object(type(contract), 'write', autospec=True, side_effect=write) as spy:
+            invoices = contract.with_context(recurring_catch_up=True)._recurring_create_invoice()
+        date_writes = [call for call in spy.call_args_list if 'recurring_next_date' in call[0][1]]
+
+        periods = [start + relativedelta(months=index) for index in range(4)]
+        self.assertEqual(invoices.contract_id, contract)
+        self.assertEqual(sorted(invoices.mapped('invoice_date')), periods)
+        env = self.env(context=dict(self.env.context, lang=self.partner_a.lang))
+        for period_start, invoice in zip(periods, invoices.sorted('invoice_date')):
+            period_end = period_start + relativedelta(months=1, days=-1)
+            self.assertIn("%s - %s" % (format_date(env, period_start), format_date(env, period_end)), invoice.narration)
+        # the contract is moved once, after the last period invoiced
+        self.assertEqual(len(date_writes), 1)
+        self.assertEqual(contract.recurring_next_date, start + relativedelta(months=4))
+        self.assertFalse(contract._recurring_create_invoice(), "the periods after the end date are never invoiced")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo.tests import tagged
+
+from .common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractUpsert(SaleContractCommon):
+
+    def _contract_values(self, external_id, **values):
+        return dict({
+            'external_id': external_id,
+            'name': 'EXT/%s' % external_id,
+            'partner_id': self.partner_a.id,
+            'pricelist_id': self.pricelist.id,
+            'company_id': self.company_data['company'].id,
+            'contract_line_ids': [{
+                'external_id': '%s-1' % external_id,
+                'product_id': self.products[0].id,
+                'name': self.products[0].name,
+                'uom_id': self.products[0].uom_id.id,
+                'quantity': 1.0,
+                'price_unit': 100.0,
+            }],
+        }, **values)
+
+    def test_upsert_creates_then_updates(self):
+        Contract = self.env['sale.contract']
+        results = Contract.upsert_external([self._contract_values('A'), self._contract_values('B')])
+        self.assertEqual([result['status'] for result in results], ['created', 'created'])
+        contract_a = Contract.browse(results[0]['id'])
+        line = contract_a.contract_line_ids
+        self.assertEqual(len(line), 1)
+
+        values = self._contract_values('A', name='EXT/A2')
+        values['contract_line_ids'][0]['quantity'] = 3.0
+        results = Contract.upsert_external([values, self._contract_values('C')])
+        self.assertEqual([result['status'] for result in results], ['updated', 'created'])
+        self.assertEqual(results[0]['id'], contract_a.id)
+        self.assertEqual(contract_a.name, 'EXT/A2')
+        # the existing line is updated in place instead of being duplicated
+        self.assertEqual(contract_a.contract_line_ids, line)
+        self.assertEqual(line.quantity, 3.0)
+
+    def test_upsert_reports_errors_per_record(self):
+        results = self.env['sale.contract'].upsert_external([
+            self._contract_values('OK'),
+            self._contract_values('KO', partner_id=False),
+        ])
+        self.assertEqual(results[0]['status'], 'created')
+        self.assertEqual(results[1]['status'], 'error')
+        self.assertTrue(results[1]['error'])
+        self.assertTrue(self.env['sale.contract'].browse(results[0]['id']).exists())
+
+    def test_upsert_without_external_id(self):
+        Contract = self.env['sale.contract']
+        values = self._contract_values(False, name='NO-EXT')
+        del values['contract_line_ids']
+        contract = Contract.create(values)
+        missing = self._contract_values('X', name='EXT/MISSING')
+        del missing['external_id']
+        results = Contract.upsert_external([
+            missing,
+            self._contract_values(False, name='EXT/FALSE'),
+            self._contract_values(None, name='EXT/NONE'),
+            self._contract_values('OK'),
+        ])
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'error', 'created'])
+        self.assertTrue(all(result['error'] for result in results[:3]))
+        # contracts without external id are never matched
+        self.assertEqual(contract.name, 'NO-EXT')
+        self.assertFalse(Contract.search([('name', 'in', ['EXT/MISSING', 'EXT/FALSE', 'EXT/NONE'])]))
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+import base64
+import csv
+import io
+
+from odoo import api, fields, models, _
+
+
+class SaleContractInvoicePreview(models.TransientModel):
+    _name = "sale.contract.invoice.preview"
+    _description = "Recurring Invoicing Preview"
+
+    date = fields.Date(string='Invoicing Date', required=True, default=fields.Date.context_today)
+    contract_ids = fields.Many2many('sale.contract', string='Contracts',
+                                    help="Contracts to preview, all the due contracts when empty.")
+    state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+    line_ids = fields.One2many('sale.contract.invoice.preview.line', 'wizard_id', string='Invoices', readonly=True)
+    invoice_count = fields.Integer(readonly=True)
+    error_count = fields.Integer(readonly=True)
+    amount_untaxed = fields.Float(string='Untaxed Amount', readonly=True, digits='Account')
+    amount_tax = fields.Float(string='Taxes', readonly=True, digits='Account')
+    amount_total = fields.Float(string='Total', readonly=True, digits='Account')
+    attachment_id = fields.Many2one('ir.attachment', string='CSV Export', readonly=True)
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super(SaleContractInvoicePreview, self).default_get(fields_list)
+        if self.env.context.get('active_model') == 'sale.contract' and 'contract_ids' in fields_list:
+            res['contract_ids'] = [(6, 0, self.env.context.get('active_ids', []))]
+        return res
+
+    def _reopen(self):
+        return {
+            'name': _('Recurring Invoicing Preview'),
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_preview(self):
+        self.ensure_one()
+        rows = self.env['sale.contract']._preview_recurring_invoices(
+            self.date, contract_ids=self.contract_ids.ids or None)
+        self.line_ids.unlink()
+        self.attachment_id.unlink()
+        lines = self.env['sale.contract.invoice.preview.line'].create([dict(row, wizard_id=self.id) for row in rows])
+        invoices = lines.filtered(lambda line: not line.error)
+        self.write({
+            'state': 'done',
+            'invoice_count': len(invoices),
+            'error_count': len(lines) - len(invoices),
+            'amount_untaxed': sum(invoices.mapped('amount_untaxed')),
+            'amount_tax': sum(invoices.mapped('amount_tax')),
+            'amount_total': sum(invoices.mapped('amount_total')),
+        })
+        return self._reopen()
+
+    def _get_csv_rows(self):
+        yield [_('Contract'), _('Customer'), _('Company'), _('Invoice Date'), _('Currency'), _('Lines'),
+               _('Untaxed Amount'), _('Taxes'), _('Total'), _('Error')]
+        for line in self.line_ids:
+            yield [
+                line.contract_id.name,
+                line.partner_id.display_name,
+                line.company_id.name,
+                fields.Date.to_string(line.invoice_date) or '',
+                line.currency_id.name or '',
+                line.line_count,
+                line.amount_untaxed,
+                line.amount_tax,
+                line.amount_total,
+                line.error or '',
+            ]
+
+    def action_export_csv(self):
+        self.ensure_one()
+        content = io.StringIO()
+        csv.writer(content).writerows(self._get_csv_rows())
+        self.attachment_id.unlink()
+        self.attachment_id = self.env['ir.attachment'].create({
+            'name': 'recurring_invoicing_preview_%s.csv' % fields.Date.to_string(self.date),
+            'datas': base64.b64encode(content.getvalue().encode()),
+            'mimetype': 'text/csv',
+            'res_model': self._name,
+            'res_id': self.id,
+        })
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/web/content/%s?download=true' % self.attachment_id.id,
+            'target': 'self',
+        }
+
+
+class SaleContractInvoicePreviewLine(models.TransientModel):
+    _name = "sale.contract.invoice.preview.line"
+    _description = "Recurring Invoicing Preview Invoice"
+    _order = 'id'
+
+    wizard_id = fields.Many2one('sale.contract.invoice.preview', required=True, ondelete='cascade')
+    contract_id = fields.Many2one('sale.contract', string='Contract', readonly=True, ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', string='Customer', readonly=True)
+    company_id = fields.Many2one('res.company', string='Company', readonly=True)
+    journal_id = fields.Many2one('account.journal', string='Journal', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    invoice_date = fields.Date(readonly=True)
+    line_count = fields.Integer(string='Lines', readonly=True)
+    amount_untaxed = fields.Monetary(string='Untaxed Amount', readonly=True)
+    amount_tax = fields.Monetary(string='Taxes', readonly=True)
+    amount_total = fields.Monetary(string='Total', readonly=True)
+    error = fields.Char(readonly=True)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from odoo import api, fields, models, _
+
+
+class SaleContractReprice(models.TransientModel):
+    _name = "sale.contract.reprice"
+    _description = "Reprice Contracts"
+
+    contract_ids = fields.Many2many('sale.contract', string='Contracts',
+                                    help="Contracts to reprice, all the contracts of the pricelists when empty.")
+    pricelist_ids = fields.Many2many('product.pricelist', string='Pricelists')
+    state = fields.Selection([('draft', 'Draft'), ('preview', 'Preview'), ('done', 'Done')], default='draft')
+    line_ids = fields.One2many('sale.contract.reprice.line', 'wizard_id', string='Price Changes', readonly=True)
+    line_count = fields.Integer(compute='_compute_line_count')
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super(SaleContractReprice, self).default_get(fields_list)
+        if self.env.context.get('active_model') == 'sale.contract' and 'contract_ids' in fields_list:
+            res['contract_ids'] = [(6, 0, self.env.context.get('active_ids', []))]
+        return res
+
+    @api.depends('line_ids')
+    def _compute_line_count(self):
+        for wizard in self:
+            wizard.line_count = len(wizard.line_ids)
+
+    def _get_contract_lines(self):
+        self.ensure_one()
+        domain = [('contract_id.state', '!=', 'cancel')]
+        if self.contract_ids:
+            domain.append(('contract_id', 'in', self.contract_ids.ids))
+        if self.pricelist_ids:
+            domain.append(('contract_id.pricelist_id', 'in', self.pricelist_ids.ids))
+        return self.env['sale.contract.line'].search(domain)
+
+    def _reprice(self, dry_run):
+        self.ensure_one()
+        changes = self._get_contract_lines()._reprice(dry_run=dry_run)
+        self.line_ids.unlink()
+        self.write({
+            'state': 'preview' if dry_run else 'done',
+            'line_ids': [(0, 0, {
+                'contract_line_id': change['line_id'],
+                'old_price_unit': change['old_price_unit'],
+                'old_discount': change['old_discount'],
+                'price_unit': change['price_unit'],
+                'discount': change['discount'],
+            }) for change in changes],
+        })
+        return {
+            'name': _('Reprice Contracts'),
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_preview(self):
+        return self._reprice(dry_run=True)
+
+    def action_apply(self):
+        return self._reprice(dry_run=False)
+
+
+class SaleContractRepriceLine(models.TransientModel):
+    _name = "sale.contract.reprice.line"
+    _description = "Contract Price Change"
+
+    wizard_id = fields.Many2one('sale.contract.reprice', required=True, ondelete='cascade')
+    contract_line_id = fields.Many2one('sale.contract.line', string='Contract Line', required=True, ondelete='cascade')
+    contract_id = fields.Many2one(related='contract_line_id.contract_id')
+    product_id = fields.Many2one(related='contract_line_id.product_id')
+    quantity = fields.Float(related='contract_line_id.quantity')
+    old_price_unit = fields.Float(string='Current Price', digits='Product Price')
+    price_unit = fields.Float(string='New Price', digits='Product Price')
+    old_discount = fields.Float(string='Current Discount (%)', digits='Discount')
+    discount = fields.Float(string='New Discount (%)', digits='Discount')
@@ -1,4 +1,3 @@
 # -*- coding: utf-8 -*-
 from . import sale_contract
 from . import sale_order
-
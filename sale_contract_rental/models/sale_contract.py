@@ -13,22 +13,62 @@ class SaleContract(models.Model):
         ('full', 'Full line amount'),
     ], string='Invoice amount', default='period')
 
+    @api.model
+    def _get_rental_pricing_id(self, product_id, duration, pricelist_id, company_id, pickup_date, return_date):
+        """Return the id of the best rental pricing of a product for a rental."""
+        return self.env['product.product'].browse(product_id)._get_best_pricing_rule(
+            pickup_date=pickup_date,
+            return_date=return_date,
+            pricelist=self.env['product.pricelist'].browse(pricelist_id),
+            company=self.env['res.company'].browse(company_id)
+        ).id
+
+    @api.model
+    def _get_rental_pricings(self, lines):
+        """
+        Resolve the rental pricing of contract lines invoiced per rental period, in bulk. The
+        pricing rules only depend on the duration of the rental, so the best pricing is resolved
+        once per (product, duration, pricelist, company), and kept for the whole recurring run:
+        it depends on the day (currency rates) and on the products, it is not cached longer.
+        :params lines: sale.contract.line records
+        :returns: dict {contract line id: rental.pricing id}
+        """
+        pricings = {}
+        resolved = {}
+        for line in lines:
+            contract = line.contract_id
+            if line.is_rental and contract.invoice_amount_type == 'period' and line.pickup_date and line.return_date:
+                key = ('rental_pricing_rule', line.product_id.id, line.return_date - line.pickup_date,
+                       contract.pricelist_id.id, contract.company_id.id, self.env.company.id)
+                if key not in resolved:
+                    resolved[key] = self._get_recurring_invoice_cached(key, lambda: self._get_rental_pricing_id(
+                        line.product_id.id, line.return_date - line.pickup_date,
+                        contract.pricelist_id.id, contract.company_id.id,
+                        line.pickup_date, line.return_date,
+                    ))
+                pricings[line.id] = resolved[key]
+        return pricings
+
+    def _prefill_recurring_invoice_cache(self):
+        super(SaleContract, self)._prefill_recurring_invoice_cache()
+        cache = self.env.context.get('recurring_invoice_cache')
+        if cache is None or not self:
+            return
+        for line_id, pricing_id in self._get_rental_pricings(self.contract_line_ids).items():
+            cache[('rental_pricing', line_id)] = pricing_id
+
     def _prepare_invoice_line(self, line, fiscal_position):
         company = self.env.company or line.analytic_account_id.company_id
-        tax_ids = line.product_id.taxes_id.filtered(lambda t: t.company_id == company)
-        if fiscal_position:
-            tax_ids = self.env['account.fiscal.position'].browse(fiscal_position).map_tax(tax_ids)
+        tax_ids = self._get_invoice_line_tax_ids(line.product_id, company, fiscal_position)
 
         price_unit = line.price_unit
 
         if hasattr(line, 'is_rental') and line.is_rental and line.contract_id.invoice_amount_type == 'period':
             if hasattr(line, 'pickup_date') and hasattr(line, 'return_date'):
-                pricing_id = line.product_id._get_best_pricing_rule(
-                    pickup_date=line.pickup_date,
-                    return_date=line.return_date,
-                    pricelist=line.contract_id.pricelist_id,
-                    company=line.contract_id.company_id
-                )
+                pricing_id = self.env['rental.pricing'].browse(self._get_recurring_invoice_cached(
+                    ('rental_pricing', line.id),
+                    lambda: self._get_rental_pricings(line).get(line.id, False),
+                ))
                 if pricing_id:
                     price_unit = pricing_id.price
 
@@ -39,7 +79,7 @@ class SaleContract(models.Model):
             'quantity': line.quantity,
             'product_uom_id': line.uom_id.id,
             'product_id': line.product_id.id,
-            'tax_ids': [(6, 0, tax_ids.ids)],
+            'tax_ids': [(6, 0, tax_ids)],
         }
 
 
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+from datetime import datetime, timedelta
+
+from odoo.tests import tagged
+
+from odoo.addons.sale_contract.tests.common import SaleContractCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSaleContractRentalQueryCount(SaleContractCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.product_a.write({
+            'rent_ok': True,
+            'rental_pricing_ids': [(0, 0, {'duration': 1, 'unit': 'day', 'price': 50.0})],
+        })
+        cls.contracts = cls._create_contracts(20, cls.partner_a, lines_per_contract=1)
+        pickup_date = datetime(2021, 1, 1, 8, 0)
+        for index, line in enumerate(cls.contracts.contract_line_ids):
+            # same rental duration, different periods
+            line.write({
+                'is_rental': True,
+                'pickup_date': pickup_date + timedelta(days=index),
+                'return_date': pickup_date + timedelta(days=index + 30),
+            })
+
+    def test_rental_pricing_resolution(self):
+        lines = self.contracts.contract_line_ids
+        resolve = self.env['sale.contract']._get_rental_pricings
+        # the pricing is resolved once for all the lines sharing a duration
+        self.assertConstantQueries(resolve, lines[:1], lines)
+        self.assertEqual(set(resolve(lines).values()), set(self.product_a.rental_pricing_ids.ids))
+
+    def test_rental_pricing_not_kept(self):
+        # outside of a recurring run, the pricings are resolved again on each call
+        line = self.contracts.contract_line_ids[:1]
+        self.assertTrue(self.env['sale.contract']._get_rental_pricings(line)[line.id])
+        self.product_a.rental_pricing_ids.unlink()
+        self.assertFalse(self.env['sale.contract']._get_rental_pricings(line)[line.id])
+
+    def test_rental_pricing_run_cache(self):
+        line = self.contracts.contract_line_ids[:1]
+        Contract = self.env['sale.contract'].with_context(recurring_invoice_cache={})
+        pricing_id = Contract._get_rental_pricings(line)[line.id]
+        self.assertTrue(pricing_id)
+        # within a run, the resolution is kept
+        with self.assertQueryCount(0):
+            self.assertEqual(Contract._get_rental_pricings(line)[line.id], pricing_id)